@@ -1,73 +1,39 @@
 from flask import Flask, render_template, Response, jsonify, request, redirect, url_for, flash, make_response
 from datetime import datetime
 from modules import db_manager
-from modules.camera import VideoCamera # الكاميرا العادية
-import cv2
-import face_recognition
+# cv2 / dlib are loaded lazily by modules.recognition on the first camera route
+from modules import recognition
+from modules import frame_bus
+from modules import gallery
+from modules import work_report
+from modules import tracing
+from modules import enrollment
 import numpy as np
-import pickle
-import time
+import os
 import io
 import csv
+import json
+import argparse
+from urllib.parse import urlsplit
 
 app = Flask(__name__)
 app.secret_key = 'secr3t_k3y'
+# Enrollment uploads: bigger requests are refused before anything reaches the disk
+app.config['MAX_CONTENT_LENGTH'] = enrollment.MAX_UPLOAD_MB * 1024 * 1024
 
-# --- كلاس كاميرا التسجيل (لإضافة موظف جديد) ---
-class RegistrationCamera:
-    def __init__(self, user_name):
-        self.video = cv2.VideoCapture(0)
-        self.user_name = user_name
-        self.encodings = []
-        self.max_samples = 20 # عدد الصور المطلوبة
-        self.is_finished = False
+# Set by --async-streams: the MJPEG/SSE routes are then served by modules.stream_server on this port
+STREAM_PORT = None
 
-    def __del__(self):
-        self.video.release()
-
-    def get_frame(self):
-        success, frame = self.video.read()
-        if not success: return None
-
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame)
-        
-        # الرسم والتوجيه
-        color = (0, 165, 255) # برتقالي
-        msg = "Looking for face..."
-
-        if len(face_locations) == 1:
-            if len(self.encodings) < self.max_samples:
-                try:
-                    encoding = face_recognition.face_encodings(rgb_frame, face_locations)[0]
-                    self.encodings.append(encoding)
-                    msg = f"Capturing: {len(self.encodings)}/{self.max_samples}"
-                    color = (0, 255, 0)
-                    time.sleep(0.1) # تأخير بسيط
-                except:
-                    pass
-            else:
-                msg = "Done! Saving..."
-                self.is_finished = True
-        
-        # رسم المربع والنص
-        if len(face_locations) > 0:
-            top, right, bottom, left = face_locations[0]
-            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-        
-        cv2.putText(frame, msg, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-        
-        ret, jpeg = cv2.imencode('.jpg', frame)
-        return jpeg.tobytes()
-
-    def save_data(self):
-        if self.encodings:
-            db_manager.add_user_with_encodings(self.user_name, self.encodings)
-            return True
-        return False
-
-# متغير عالمي لتخزين جلسة التسجيل الحالية
-registration_session = None
+@app.context_processor
+def stream_urls():
+    def stream_url(endpoint, **values):
+        if STREAM_PORT is None:
+            return url_for(endpoint, **values)
+        host = urlsplit(request.host_url).hostname
+        if ':' in host:
+            host = f'[{host}]'
+        return f"//{host}:{STREAM_PORT}{url_for(endpoint, **values)}"
+    return {'stream_url': stream_url}
 
 # --- الروابط (Routes) ---
 
@@ -98,29 +64,76 @@ def download_detailed_csv():
     if not month:
         month = datetime.now().strftime('%Y-%m')
         
-    data = db_manager.get_detailed_monthly_report_data(month)
+    detail = request.args.get('detail') == '1'
+    report = work_report.monthly_report(month, details=detail)
     
     # Create CSV
     si = io.StringIO()
     si.write('\ufeff') # BOM for Excel support (Arabic)
     cw = csv.writer(si)
     
-    # Header
-    cw.writerow(['Employee Name', 'Days Present', 'Days Absent', 'Total Days in Month'])
-    
-    # Rows
-    for row in data:
-        cw.writerow([row['name'], row['present'], row['absent'], row['total']])
+    if detail:
+        # One row per employee per day present
+        cw.writerow(['Employee Name', 'Date', 'Day Type', 'First In', 'Last Out', 'Hours', 'Late'])
+        for row in report['employees']:
+            for day in row['days']:
+                cw.writerow([row['name'], day['date'], day['day_type'], day['first_in'], day['last_out'],
+                             day['hours'], 'Yes' if day['late'] else ''])
+    else:
+        cw.writerow(['Employee Name', 'Working Days', 'Days Present', 'Days Absent', 'Late Arrivals',
+                     'Total Hours', 'Avg Hours/Day', 'Avg First In', 'Days Worked Off-Schedule'])
+        for row in report['employees']:
+            cw.writerow([row['name'], row['working_days'], row['present'], row['absent'], row['late'],
+                         row['hours'], row['avg_hours'], row['avg_first_in'], row['off_days_worked']])
         
     output = make_response(si.getvalue())
-    output.headers["Content-Disposition"] = f"attachment; filename=Detailed_Report_{month}.csv"
+    output.headers["Content-Disposition"] = f"attachment; filename={'Daily' if detail else 'Detailed'}_Report_{month}.csv"
     output.headers["Content-type"] = "text/csv; charset=utf-8-sig"
     return output
 
 @app.route('/employees')
 def employees():
-    users = db_manager.get_users_list()
-    return render_template('employees.html', users=users)
+    q = request.args.get('q', '').strip()
+    try:
+        users, next_cursor = db_manager.get_users_page(request.args.get('cursor'), request.args.get('limit', db_manager.PAGE_SIZE), q)
+    except db_manager.InvalidCursor:
+        # Broken link: show the first page instead of an error
+        users, next_cursor = db_manager.get_users_page(None, request.args.get('limit', db_manager.PAGE_SIZE), q)
+    return render_template('employees.html', users=users, next_cursor=next_cursor, q=q)
+
+@app.route('/history')
+def history():
+    filters = {
+        'q': request.args.get('q', '').strip(),
+        'from': request.args.get('from', ''),
+        'to': request.args.get('to', ''),
+    }
+    try:
+        rows, next_cursor = db_manager.get_attendance_page(request.args.get('cursor'), request.args.get('limit', db_manager.PAGE_SIZE),
+                                                           filters['q'], filters['from'], filters['to'])
+    except db_manager.InvalidCursor:
+        rows, next_cursor = db_manager.get_attendance_page(None, request.args.get('limit', db_manager.PAGE_SIZE),
+                                                           filters['q'], filters['from'], filters['to'])
+    return render_template('history.html', rows=rows, next_cursor=next_cursor, filters=filters)
+
+# --- JSON (صفحات بمؤشر keyset) ---
+@app.route('/api/employees')
+def api_employees():
+    try:
+        users, next_cursor = db_manager.get_users_page(request.args.get('cursor'), request.args.get('limit', db_manager.PAGE_SIZE),
+                                                       request.args.get('q'))
+    except db_manager.InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'items': [dict(u) for u in users], 'next_cursor': next_cursor})
+
+@app.route('/api/attendance')
+def api_attendance():
+    try:
+        rows, next_cursor = db_manager.get_attendance_page(request.args.get('cursor'), request.args.get('limit', db_manager.PAGE_SIZE),
+                                                           request.args.get('q'), request.args.get('from'), request.args.get('to'))
+    except db_manager.InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'items': [dict(r) for r in rows], 'next_cursor': next_cursor})
 
 @app.route('/edit_employee/<int:user_id>', methods=['POST'])
 def edit_employee(user_id):
@@ -136,57 +149,213 @@ def delete_employee(user_id):
     flash('Employee deleted successfully', 'danger')
     return redirect(url_for('employees'))
 
+# --- API لأجهزة الأبواب: مطابقة بصمات محسوبة مسبقاً ---
+MAX_IDENTIFY_BATCH = 256
+
+@app.route('/api/identify', methods=['POST'])
+def api_identify():
+    """
+    Body: JSON {"embeddings": [[128 floats], ...], "record": false, "tolerance": 0.5}
+    or raw little-endian float32 N x 128 (Content-Type: application/octet-stream,
+    ?record=1&tolerance=0.5). With record, tolerance is capped at gallery.TOLERANCE.
+    """
+    if request.mimetype == 'application/octet-stream':
+        data = request.get_data()
+        if len(data) % (128 * 4):
+            return jsonify({'error': 'body must be N x 128 float32 values'}), 400
+        embeddings = np.frombuffer(data, dtype='<f4').reshape(-1, 128)
+        record = request.args.get('record')
+        tolerance = request.args.get('tolerance', gallery.TOLERANCE, type=float)
+    else:
+        payload = request.get_json(silent=True)
+        if payload is None:
+            payload = {}
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'body must be a JSON object'}), 400
+        try:
+            embeddings = np.asarray(payload.get('embeddings', []), dtype=np.float64).reshape(-1, 128)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'embeddings must be a list of 128-d vectors'}), 400
+        record = payload.get('record')
+        try:
+            tolerance = float(payload.get('tolerance', gallery.TOLERANCE))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'tolerance must be a number'}), 400
+
+    # Same flag in both forms: true/1 (or JSON true) records, anything else ("false", "0", null) does not
+    record = str(record).lower() in ('1', 'true')
+    if len(embeddings) == 0:
+        return jsonify({'error': 'no embeddings'}), 400
+    if len(embeddings) > MAX_IDENTIFY_BATCH:
+        return jsonify({'error': f'at most {MAX_IDENTIFY_BATCH} embeddings per request'}), 413
+    if not np.isfinite(tolerance) or tolerance <= 0:
+        return jsonify({'error': 'tolerance must be a positive number'}), 400
+    if not np.isfinite(embeddings).all():
+        return jsonify({'error': 'embeddings must be finite'}), 400
+    if record:
+        # A client may ask for a stricter match, never a looser one, when attendance is recorded
+        tolerance = min(tolerance, gallery.TOLERANCE)
+
+    results = []
+    for user_id, name, distance in gallery.get_shared_gallery().match_batch(embeddings, tolerance):
+        result = {'user_id': user_id, 'name': name, 'distance': distance}
+        if record and user_id is not None:
+            # Same cooldown as the cameras (None = already marked in this window)
+            result['attendance_id'] = db_manager.mark_attendance(user_id)
+        results.append(result)
+    return jsonify({'results': results})
+
+# --- تتبع زمني للإطارات (ATTENDANCE_TRACE=1) ---
+@app.route('/debug/trace')
+def debug_trace():
+    """Chrome/Perfetto trace of the recent frames in this process."""
+    if not tracing.enabled:
+        return jsonify({'error': 'tracing is off, start with ATTENDANCE_TRACE=1'}), 404
+    output = make_response(json.dumps(tracing.trace_json()))
+    output.headers["Content-Disposition"] = f"attachment; filename=trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.headers["Content-type"] = "application/json"
+    return output
+
 # --- صفحة إضافة موظف ---
+# التسجيل يعمل في الخلفية (modules.enrollment)، الصفحات تقرأ حالة المهمة فقط
 @app.route('/add_employee', methods=['GET', 'POST'])
 def add_employee():
-    global registration_session
-    
     if request.method == 'POST':
         name = request.form.get('name')
         if name:
-            registration_session = RegistrationCamera(name)
-            return render_template('training.html', name=name)
-            
-    return render_template('add_employee.html')
+            queue = enrollment.get_queue()
+            uploads = [f for f in request.files.getlist('files') if f and f.filename]
+            if uploads:
+                error = enrollment.check_uploads([f.filename for f in uploads])
+                if error:
+                    flash(error, 'danger')
+                    return redirect(url_for('add_employee'))
+                upload_dir = enrollment.new_upload_dir()
+                paths = []
+                for i, upload in enumerate(uploads):
+                    path = os.path.join(upload_dir, f"{i:03d}{os.path.splitext(upload.filename)[1].lower()}")
+                    upload.save(path)
+                    paths.append(path)
+                job = queue.submit_files(name, paths, upload_dir=upload_dir)
+            else:
+                recognition.warm_up_async()
+                job = queue.submit_camera(name)
+            return redirect(url_for('enrollment_status', job_id=job.id))
+
+    recognition.warm_up_async()
+    return render_template('add_employee.html', jobs=enrollment.get_queue().list())
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    flash(f'Upload is larger than {enrollment.MAX_UPLOAD_MB} MB', 'danger')
+    return redirect(url_for('add_employee'))
+
+@app.route('/enrollment/<job_id>')
+def enrollment_status(job_id):
+    job = enrollment.get_queue().get(job_id)
+    if job is None:
+        flash('Enrollment not found', 'warning')
+        return redirect(url_for('add_employee'))
+    return render_template('training.html', job=job)
 
 @app.route('/training_feed')
 def training_feed():
-    global registration_session
-    def gen(camera):
-        while True:
-            if camera.is_finished:
-                break
-            frame = camera.get_frame()
-            if frame:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
-    
-    return Response(gen(registration_session), mimetype='multipart/x-mixed-replace; boundary=frame')
+    job = enrollment.get_queue().get(request.args.get('job', ''))
+    if job is None:
+        return jsonify({'error': 'unknown enrollment'}), 404
+
+    def gen():
+        for frame in job.frames():
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
+
+    return Response(gen(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
-@app.route('/check_training_status')
-def check_training_status():
-    global registration_session
-    if registration_session and registration_session.is_finished:
-        registration_session.save_data()
-        registration_session = None # إنهاء الجلسة
-        return jsonify({'status': 'finished'})
-    return jsonify({'status': 'training'})
+@app.route('/api/enrollments')
+def api_enrollments():
+    return jsonify(enrollment.get_queue().list())
+
+@app.route('/api/enrollments/<job_id>')
+def api_enrollment(job_id):
+    job = enrollment.get_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown enrollment'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/enrollments/<job_id>/cancel', methods=['POST'])
+def cancel_enrollment(job_id):
+    if not enrollment.get_queue().cancel(job_id):
+        return jsonify({'error': 'enrollment not found or already finished'}), 404
+    return jsonify({'status': 'cancelling'})
 
 # --- الكاميرا الرئيسية (Dashboard) ---
 # (نفس دالة video_feed القديمة، يمكن وضعها في صفحة مستقلة أو في الداشبورد)
 # هنا سأفترض أنك تريدها في صفحة "Live Monitor" منفصلة أو جزء من الداشبورد
 @app.route('/live_monitor')
 def live_monitor():
+    if not frame_bus.is_worker_running():
+        recognition.warm_up_async()
     return render_template('monitor.html')
 
 @app.route('/video_feed')
 def video_feed():
-    return Response(gen_frames(VideoCamera()), mimetype='multipart/x-mixed-replace; boundary=frame')
+    # Prefer the recognition worker (run_recognition_worker.py); fall back to an in-process camera
+    try:
+        subscriber = frame_bus.FrameSubscriber('frames')
+    except OSError:
+        return Response(gen_frames(recognition.load().VideoCamera()), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(gen_worker_frames(subscriber), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/attendance_events')
+def attendance_events():
+    try:
+        subscriber = frame_bus.FrameSubscriber('events')
+    except OSError:
+        return jsonify({'error': 'recognition worker is not running'}), 503
+
+    def gen():
+        try:
+            for event in subscriber.events():
+                if event is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield f'data: {json.dumps(event)}\n\n'
+        finally:
+            subscriber.close()
+
+    return Response(gen(), mimetype='text/event-stream')
+
+def gen_worker_frames(subscriber):
+    try:
+        for frame in subscriber.frames():
+            yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
+    finally:
+        subscriber.close()
 
 def gen_frames(camera):
-    while True:
-        frame = camera.get_frame()
-        if frame: yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
+    camera.encoder.add_subscriber()
+    try:
+        while True:
+            frame = camera.get_frame()
+            if frame: yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
+    finally:
+        camera.encoder.remove_subscriber()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Attendance admin dashboard.")
+    parser.add_argument('--async-streams', action='store_true',
+                        help="serve /video_feed, /training_feed and /attendance_events from an asyncio server")
+    parser.add_argument('--stream-port', type=int, default=5001)
+    args = parser.parse_args()
+
+    db_manager.init_db()
+    if tracing.enabled:
+        tracing.install_signal_handler()
+    if args.async_streams:
+        from modules.stream_server import StreamServer
+        STREAM_PORT = args.stream_port
+        StreamServer(port=STREAM_PORT, get_enrollment=enrollment.get_queue().get).start_in_thread()
+        # The reloader would start a second stream server in the watcher process
+        app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
+    else:
+        app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
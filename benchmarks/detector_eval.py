@@ -0,0 +1,103 @@
+"""
+Face detection benchmark: the cascaded detectors against the dlib HOG baseline.
+Runs every mode on the same frames (0.25x, like the recognition loop) and
+reports time per frame and recall, i.e. the share of HOG faces that the mode
+also found (overlap >= 0.5), plus how many frames skipped dlib entirely.
+
+Usage:
+  python benchmarks/detector_eval.py FOLDER_OR_VIDEO [--modes hog,haar+hog,haar] [--max-frames 500]
+"""
+import os
+import sys
+import time
+import argparse
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.face_detector import FaceDetector, DETECTORS
+
+SCALE = 0.25
+MATCH_OVERLAP = 0.5
+
+
+def overlap(a, b):
+    """Intersection over the smaller box, for (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    if bottom <= top or right <= left:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[1] - a[3]), (b[2] - b[0]) * (b[1] - b[3]))
+    return (bottom - top) * (right - left) / max(smaller, 1)
+
+
+def load_frames(source, max_frames):
+    """RGB frames at the recognition scale, from a folder of images or a video file."""
+    frames = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if len(frames) >= max_frames:
+                break
+            image = cv2.imread(os.path.join(source, name))
+            if image is not None:
+                frames.append(image)
+    else:
+        capture = cv2.VideoCapture(source)
+        while len(frames) < max_frames:
+            ok, image = capture.read()
+            if not ok:
+                break
+            frames.append(image)
+        capture.release()
+    return [cv2.cvtColor(cv2.resize(f, (0, 0), fx=SCALE, fy=SCALE), cv2.COLOR_BGR2RGB) for f in frames]
+
+
+def run(detector, frames):
+    boxes = []
+    start = time.perf_counter()
+    for rgb in frames:
+        boxes.append(detector.detect(rgb))
+    return boxes, (time.perf_counter() - start) / max(len(frames), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall and speed of the face detector modes against dlib HOG.")
+    parser.add_argument('source', help="folder of images or a video file")
+    parser.add_argument('--modes', default='haar+hog,haar,dnn+hog', help=f"comma separated, from {DETECTORS}")
+    parser.add_argument('--max-frames', type=int, default=500)
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.max_frames)
+    if not frames:
+        raise SystemExit("❌ No frames found")
+    print(f"--- 🔎 Detector benchmark: {len(frames)} frames at {SCALE}x ({frames[0].shape[1]}x{frames[0].shape[0]}) ---")
+
+    baseline, baseline_time = run(FaceDetector('hog'), frames)
+    total_faces = sum(len(b) for b in baseline)
+    empty = sum(1 for b in baseline if not b)
+    print(f"HOG baseline: {total_faces} faces, {empty} frames without a face, {baseline_time * 1000:.1f} ms/frame\n")
+
+    print(f"{'mode':<10} {'ms/frame':>9} {'speedup':>8} {'recall':>7} {'extra':>6} {'no-dlib frames':>15}")
+    for mode in args.modes.split(','):
+        try:
+            detector = FaceDetector(mode.strip())
+        except (RuntimeError, OSError) as e:
+            print(f"{mode:<10} unavailable ({e})")
+            continue
+        if detector.mode != mode.strip():
+            print(f"{mode:<10} unavailable (fell back to {detector.mode})")
+            continue
+        boxes, seconds = run(detector, frames)
+        found = extra = 0
+        for expected, got in zip(baseline, boxes):
+            matched = [any(overlap(e, g) >= MATCH_OVERLAP for g in got) for e in expected]
+            found += sum(matched)
+            extra += sum(1 for g in got if not any(overlap(e, g) >= MATCH_OVERLAP for e in expected))
+        recall = found / total_faces if total_faces else 1.0
+        skipped = sum(1 for rgb in frames if not detector.candidates(rgb)) if mode.endswith('+hog') else len(frames)
+        print(f"{mode:<10} {seconds * 1000:>9.1f} {baseline_time / max(seconds, 1e-9):>7.1f}x {recall:>7.1%} "
+              f"{extra:>6} {skipped:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Per-frame allocation benchmark for the camera pipeline.
+Runs the non-dlib part of VideoCamera.get_frame (capture, 1/4 resize, RGB
+conversion, overlay, stream downscale + change signature, JPEG) on synthetic
+frames, once the old way (a new array at every stage) and once through
+FramePool, and reports the memory allocated per frame with tracemalloc.
+
+Usage: python benchmarks/frame_allocations.py [--width 1920 --height 1080 --frames 300]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.frame_pool import FramePool
+from modules.stream_encoder import StreamEncoder, SIGNATURE_SIZE, encode_jpeg
+
+
+class SyntheticCapture:
+    """Mimics cv2.VideoCapture.read(image=None): fills the given buffer if its shape matches."""
+    def __init__(self, width, height, count=8):
+        rng = np.random.default_rng(0)
+        self.frames = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+        self.index = 0
+
+    def read(self, image=None):
+        src = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        if image is not None and image.shape == src.shape:
+            np.copyto(image, src)
+            return True, image
+        return True, src.copy()
+
+
+def draw_overlay(frame):
+    cv2.rectangle(frame, (400, 200), (800, 700), (0, 255, 0), 2)
+    cv2.putText(frame, "PLEASE BLINK", (400, 190), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
+
+
+def legacy_frame(capture, encoder):
+    """The pipeline before FramePool: every stage returns a new array."""
+    _, frame = capture.read()
+    small = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+    cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+    draw_overlay(frame)
+    gray = cv2.cvtColor(np.ascontiguousarray(frame[::8, ::8]), cv2.COLOR_BGR2GRAY)
+    cv2.resize(gray, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+    height = int(frame.shape[0] * encoder.width / frame.shape[1])
+    return encode_jpeg(cv2.resize(frame, (encoder.width, height), interpolation=cv2.INTER_AREA), encoder.quality)
+
+
+def pooled_frame(capture, encoder, pool):
+    """The current pipeline (see VideoCamera.get_frame)."""
+    _, frame = pool.read(capture)
+    small = pool.resize('small', frame, fx=0.25)
+    pool.to_rgb('rgb_small', small)
+    draw_overlay(frame)
+    return encoder.encode(frame, force=True)
+
+
+def measure(step, frames):
+    step()  # warm-up: first-frame buffers are not counted
+    tracemalloc.start()
+    allocated = []
+    start = time.perf_counter()
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        step()
+        _, peak = tracemalloc.get_traced_memory()
+        allocated.append(peak - before)
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return np.mean(allocated), elapsed / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Allocations per frame, before and after FramePool.")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--frames', type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"--- 🧮 Frame allocations ({args.width}x{args.height}, {args.frames} frames) ---")
+
+    capture = SyntheticCapture(args.width, args.height)
+    encoder = StreamEncoder()
+    encoder.add_subscriber()
+    legacy_bytes, legacy_time = measure(lambda: legacy_frame(capture, encoder), args.frames)
+
+    capture = SyntheticCapture(args.width, args.height)
+    encoder = StreamEncoder()
+    encoder.add_subscriber()
+    pool = FramePool()
+    pooled_bytes, pooled_time = measure(lambda: pooled_frame(capture, encoder, pool), args.frames)
+
+    print(f"{'pipeline':<10} {'KB allocated/frame':>20} {'ms/frame':>10}")
+    print(f"{'before':<10} {legacy_bytes / 1024:>20.1f} {legacy_time * 1000:>10.2f}")
+    print(f"{'after':<10} {pooled_bytes / 1024:>20.1f} {pooled_time * 1000:>10.2f}")
+    print(f"Pool holds {(pool.nbytes() + encoder.pool.nbytes()) / 1024:.0f} KB, allocated once. "
+          f"What remains per frame is the JPEG output itself.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Import-time benchmark for the admin dashboard.
+Measures how long `import app` takes in a fresh interpreter and checks that
+the recognition stack (cv2, face_recognition/dlib) was NOT loaded.
+
+Usage: python benchmarks/import_time.py [runs]
+"""
+import os
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["cv2", "dlib", "face_recognition", "modules.camera"]
+MAX_IMPORT_SECONDS = 1.5
+
+CHECK_SCRIPT = f"""
+import sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+
+def measure(script):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", script], cwd=BASE_DIR, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return wall, result.stdout.strip().splitlines()[-1]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"--- ⏱️ Import benchmark: app.py ({runs} runs) ---")
+
+    import_times = []
+    wall_times = []
+    heavy = set()
+    for _ in range(runs):
+        wall, line = measure(CHECK_SCRIPT)
+        elapsed, loaded = line.split(" ", 1) if " " in line else (line, "")
+        import_times.append(float(elapsed))
+        wall_times.append(wall)
+        heavy.update(m for m in loaded.split(",") if m)
+
+    import_times.sort()
+    print(f"import app: median {import_times[len(import_times) // 2] * 1000:.0f} ms, "
+          f"max {import_times[-1] * 1000:.0f} ms (process wall median {sorted(wall_times)[len(wall_times) // 2] * 1000:.0f} ms)")
+
+    try:
+        wall, _ = measure("import face_recognition; print('ok')")
+        print(f"for reference, import face_recognition alone: {wall * 1000:.0f} ms")
+    except RuntimeError:
+        print("for reference: face_recognition is not installed here")
+
+    if heavy:
+        print(f"❌ Heavy modules loaded at import time: {', '.join(sorted(heavy))}")
+        sys.exit(1)
+    if import_times[len(import_times) // 2] > MAX_IMPORT_SECONDS:
+        print(f"❌ Import slower than {MAX_IMPORT_SECONDS}s")
+        sys.exit(1)
+    print("✅ Reporting-only process starts without the recognition stack.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+Load test for the web app.
+Builds a synthetic database in a temp folder, publishes frames from files on
+the recognition-worker channel (no camera or dlib needed), starts app.py
+against them and drives a mix of concurrent clients:
+  dashboard  GET /
+  employees  GET /employees
+  csv        GET /download_detailed_csv
+  history    GET /history
+  video      GET /video_feed (MJPEG, counts delivered frames)
+  events     GET /attendance_events (SSE)
+Reports throughput, latency percentiles and per-client stream fps.
+
+Usage:
+  python benchmarks/load_test.py --mix dashboard=4,employees=4,csv=1,video=20 --duration 30
+  python benchmarks/load_test.py --frames clip.mp4 --async-streams
+"""
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from modules import db_manager
+from modules import frame_bus
+
+PAGE_ROUTES = {
+    'dashboard': '/',
+    'employees': '/employees',
+    'csv': '/download_detailed_csv',
+    'history': '/history',
+}
+STREAM_ROUTES = {
+    'video': '/video_feed',
+    'events': '/attendance_events',
+}
+DEFAULT_MIX = 'dashboard=4,employees=4,csv=1,video=10'
+
+# Runs app.py in a child process against the synthetic database
+APP_BOOTSTRAP = """
+import sys
+sys.path.insert(0, {base_dir!r})
+from modules import db_manager
+db_manager.DB_PATH = {db_path!r}
+db_manager.SNAPSHOT_DIR = {snapshot_dir!r}
+import app
+if {stream_port!r}:
+    from modules.stream_server import StreamServer
+    app.STREAM_PORT = {stream_port!r}
+    StreamServer(host='127.0.0.1', port={stream_port!r}).start_in_thread()
+app.app.run(host='127.0.0.1', port={port!r}, threaded=True)
+"""
+
+
+# --- synthetic data ---
+
+def build_database(users, days, checkins):
+    """Random employees (5 encodings each) and `checkins` rows per employee per weekday."""
+    rng = np.random.default_rng(0)
+    db_manager.init_db()
+    batch = [(f"Employee {i:05d}", list(rng.normal(0, 0.1, (5, 128)))) for i in range(users)]
+    user_ids = db_manager.add_users_bulk(batch)
+
+    rows = []
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    for day in range(days):
+        date = start + timedelta(days=day)
+        if date.weekday() >= 5:
+            continue
+        for user_id in user_ids:
+            if rng.random() < 0.1:
+                continue    # absent
+            for k in range(checkins):
+                when = date + timedelta(hours=8 + k * 9 / max(checkins - 1, 1), minutes=int(rng.integers(0, 45)))
+                rows.append((user_id, when.strftime("%Y-%m-%d %H:%M:%S"),
+                             int(when.timestamp() // db_manager.ATTENDANCE_COOLDOWN_SECONDS)))
+    conn = db_manager.get_db_connection()
+    conn.executemany('INSERT OR IGNORE INTO attendance (user_id, timestamp, bucket) VALUES (?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+    return len(user_ids), len(rows)
+
+
+def load_frames(source, count=60, size=(640, 480)):
+    """JPEG bytes from a folder of images, a video file, or synthetic frames when source is None."""
+    if source and os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(('.jpg', '.jpeg')))
+        frames = []
+        for name in names:
+            with open(os.path.join(source, name), 'rb') as f:
+                frames.append(f.read())
+        return frames
+
+    frames = []
+    if source:
+        video = cv2.VideoCapture(source)
+        while len(frames) < count:
+            ok, frame = video.read()
+            if not ok:
+                break
+            frames.append(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])[1].tobytes())
+        video.release()
+        return frames
+
+    width, height = size
+    for i in range(count):
+        frame = np.full((height, width, 3), 40, dtype=np.uint8)
+        x = int((width - 160) * (0.5 + 0.5 * np.sin(i / count * 2 * np.pi)))
+        cv2.rectangle(frame, (x, 150), (x + 160, 330), (0, 255, 0), 2)
+        cv2.putText(frame, f"frame {i}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        frames.append(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])[1].tobytes())
+    return frames
+
+
+class FilePublisher:
+    """Stands in for run_recognition_worker.py: publishes the frames in a loop at `fps`."""
+    def __init__(self, frames, fps, event_every=30):
+        self.publisher = frame_bus.FramePublisher()
+        self.frames = frames
+        self.fps = fps
+        self.event_every = event_every
+        self.published = 0
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        next_time = time.perf_counter()
+        while self.running:
+            self.publisher.publish_frame(self.frames[self.published % len(self.frames)])
+            self.published += 1
+            if self.published % self.event_every == 0:
+                self.publisher.publish_event({"type": "attendance", "user_id": 1, "name": "Load Test", "time": time.time()})
+            next_time += interval
+            time.sleep(max(0, next_time - time.perf_counter()))
+
+    def close(self):
+        self.running = False
+        self.publisher.close()
+
+
+# --- clients ---
+
+def page_client(port, path, deadline, results):
+    """Sequential GETs on one keep-alive connection until the deadline."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            body = response.read()
+            results.append((time.perf_counter() - start, response.status, len(body)))
+        except (OSError, http.client.HTTPException):
+            results.append((time.perf_counter() - start, 0, 0))
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    conn.close()
+
+
+def stream_client(port, path, deadline, results):
+    """Reads a stream until the deadline; records delivered items and time to the first one."""
+    marker = b'--frame' if path == '/video_feed' else b'data:'
+    start = time.perf_counter()
+    first = None
+    count = 0
+    tail = b''
+    status = 0
+    error = None
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        conn.request('GET', path)
+        response = conn.getresponse()
+        status = response.status
+        while time.time() < deadline and status == 200:
+            chunk = response.read1(65536)
+            if not chunk:
+                break
+            data = tail + chunk
+            found = data.count(marker)
+            if found and first is None:
+                first = time.perf_counter() - start
+            count += found
+            tail = data[-(len(marker) - 1):]
+        conn.close()
+    except (OSError, http.client.HTTPException) as e:
+        error = repr(e)
+    results.append({"status": status, "items": count, "seconds": time.perf_counter() - start,
+                    "first": first, "error": error})
+
+
+# --- report ---
+
+def percentiles(values):
+    values = np.asarray(values) * 1000
+    return {p: float(np.percentile(values, p)) for p in (50, 90, 99)} | {"max": float(values.max())}
+
+
+def report(page_results, stream_results, duration):
+    print(f"\n{'route':<12} {'clients':>7} {'requests':>9} {'errors':>7} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    summary = {}
+    for kind, per_client in page_results.items():
+        samples = [r for client in per_client for r in client]
+        ok = [r[0] for r in samples if r[1] == 200]
+        errors = len(samples) - len(ok)
+        line = {"clients": len(per_client), "requests": len(samples), "errors": errors,
+                "throughput": len(ok) / duration}
+        if ok:
+            line.update(percentiles(ok))
+            print(f"{kind:<12} {len(per_client):>7} {len(samples):>9} {errors:>7} {line['throughput']:>8.1f} "
+                  f"{line[50]:>8.1f} {line[90]:>8.1f} {line[99]:>8.1f} {line['max']:>8.1f}")
+        else:
+            print(f"{kind:<12} {len(per_client):>7} {len(samples):>9} {errors:>7} {'-':>8}")
+        summary[kind] = line
+
+    for kind, per_client in stream_results.items():
+        unit = 'fps' if kind == 'video' else 'events/s'
+        rates = [c["items"] / c["seconds"] for c in per_client if c["status"] == 200]
+        failed = sum(1 for c in per_client if c["status"] != 200)
+        firsts = [c["first"] for c in per_client if c["first"] is not None]
+        print(f"\n{kind} ({unit} per client): {len(per_client)} clients, {failed} refused/failed")
+        errors = sorted({c["error"] or f"HTTP {c['status']}" for c in per_client if c["status"] != 200})
+        if errors:
+            print("  failures: " + "; ".join(errors))
+        if rates:
+            print(f"  min {min(rates):.1f}  median {np.median(rates):.1f}  max {max(rates):.1f}"
+                  + (f"  | first item p50 {np.median(firsts) * 1000:.0f} ms" if firsts else ""))
+            print("  per client: " + " ".join(f"{r:.1f}" for r in rates))
+        summary[kind] = {"clients": len(per_client), "failed": failed, "rates": rates}
+    return summary
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        kind, _, count = part.partition('=')
+        kind = kind.strip()
+        if kind not in PAGE_ROUTES and kind not in STREAM_ROUTES:
+            raise SystemExit(f"unknown client kind '{kind}', expected one of {list(PAGE_ROUTES) + list(STREAM_ROUTES)}")
+        mix[kind] = int(count or 1)
+    return mix
+
+
+def wait_until_ready(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("❌ app.py exited during startup")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/employees?limit=1')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit("❌ app.py did not start in time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for app.py on a synthetic database.")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"clients per kind (default {DEFAULT_MIX})")
+    parser.add_argument('--duration', type=float, default=20, help="seconds of load")
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--days', type=int, default=60, help="days of attendance history")
+    parser.add_argument('--checkins', type=int, default=2, help="attendance rows per employee per working day")
+    parser.add_argument('--frames', help="folder of JPEGs or a video file (default: synthetic frames)")
+    parser.add_argument('--fps', type=float, default=15, help="published frame rate")
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--async-streams', action='store_true', help="serve the streams from modules.stream_server")
+    parser.add_argument('--stream-port', type=int, default=5056)
+    parser.add_argument('--json', help="also write the summary to this file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if frame_bus.is_worker_running():
+        raise SystemExit("❌ A recognition worker is already running on the frame bus port. Stop it first.")
+
+    work_dir = tempfile.mkdtemp(prefix='attendance_load_')
+    db_manager.DB_PATH = os.path.join(work_dir, 'attendance.db')
+    db_manager.SNAPSHOT_DIR = os.path.join(work_dir, 'snapshot')
+
+    print("--- 🏋️ Load test ---")
+    users, rows = build_database(args.users, args.days, args.checkins)
+    print(f"🗄️ Synthetic database: {users} employees, {rows} attendance rows ({work_dir})")
+
+    frames = load_frames(args.frames)
+    if not frames:
+        raise SystemExit("❌ No frames found")
+    publisher = FilePublisher(frames, args.fps)
+    print(f"🎞️ Publishing {len(frames)} frames in a loop at {args.fps} fps")
+
+    stream_port = args.stream_port if args.async_streams else None
+    script = APP_BOOTSTRAP.format(base_dir=BASE_DIR, db_path=db_manager.DB_PATH, snapshot_dir=db_manager.SNAPSHOT_DIR,
+                                  stream_port=stream_port, port=args.port)
+    process = subprocess.Popen([sys.executable, '-c', script], cwd=BASE_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(args.port, process)
+        print(f"🚀 app.py up on port {args.port}" + (f", async streams on {stream_port}" if stream_port else ""))
+        print(f"👥 Mix: {mix} for {args.duration:.0f}s")
+
+        published = []
+        threading.Timer(0, lambda: published.append(publisher.published)).start()
+        threading.Timer(args.duration, lambda: published.append(publisher.published)).start()
+        deadline = time.time() + args.duration
+        page_results = {kind: [] for kind in mix if kind in PAGE_ROUTES}
+        stream_results = {kind: [] for kind in mix if kind in STREAM_ROUTES}
+        threads = []
+        for kind, count in mix.items():
+            for _ in range(count):
+                if kind in PAGE_ROUTES:
+                    results = []
+                    page_results[kind].append(results)
+                    target = (page_client, (args.port, PAGE_ROUTES[kind], deadline, results))
+                else:
+                    target = (stream_client, (stream_port or args.port, STREAM_ROUTES[kind], deadline, stream_results[kind]))
+                threads.append(threading.Thread(target=target[0], args=target[1], daemon=True))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(args.duration + 70)
+
+        summary = report(page_results, stream_results, args.duration)
+        published = published[-1] - published[0]
+        print(f"\n🎞️ Frames published during the run: {published} ({published / args.duration:.1f} fps)")
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({"args": vars(args), "results": summary}, f, indent=1, default=str)
+    finally:
+        process.terminate()
+        process.wait(10)
+        publisher.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
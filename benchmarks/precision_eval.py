@@ -0,0 +1,72 @@
+"""
+Reduced-precision gallery evaluation.
+Compares float16 and int8 matching against the float64 baseline: distance
+error, top-1 agreement, gallery memory and query time.
+
+Usage:
+  python benchmarks/precision_eval.py                 # gallery from the database
+  python benchmarks/precision_eval.py --synthetic 20000
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.quantization import make_matcher
+
+def synthetic_gallery(samples, per_user=10, seed=0):
+    """Clustered 128-d vectors with roughly the spread of dlib encodings."""
+    rng = np.random.default_rng(seed)
+    users = max(1, samples // per_user)
+    centers = rng.normal(0, 0.1, size=(users, 128))
+    return np.repeat(centers, per_user, axis=0) + rng.normal(0, 0.03, size=(users * per_user, 128))
+
+def load_db_gallery():
+    from modules import db_manager
+    users = db_manager.get_all_embeddings()
+    return np.array([user["encoding"] for user in users], dtype=np.float64)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--synthetic', type=int, help="use N synthetic samples instead of the database")
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--noise', type=float, default=0.03, help="std-dev added to gallery samples to make queries")
+    args = parser.parse_args()
+
+    gallery = synthetic_gallery(args.synthetic) if args.synthetic else load_db_gallery()
+    if len(gallery) < 2:
+        print("❌ Gallery too small, use --synthetic N")
+        return
+
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(gallery), min(args.queries, len(gallery)), replace=False)
+    queries = gallery[picks] + rng.normal(0, args.noise, size=(len(picks), 128))
+
+    print(f"--- 🔬 Precision evaluation: {len(gallery)} samples, {len(queries)} queries ---")
+    baseline = make_matcher(gallery, 'float64')
+    base_distances = np.array([baseline.distances(q) for q in queries])
+    base_top1 = base_distances.argmin(axis=1)
+
+    print(f"{'precision':<10}{'memory':>12}{'ratio':>8}{'max err':>10}{'mean err':>10}{'top-1 agree':>13}{'ms/query':>10}{'batch ms/q':>12}")
+    for precision in ('float64', 'float16', 'int8'):
+        matcher = make_matcher(gallery, precision)
+
+        start = time.perf_counter()
+        distances = np.array([matcher.distances(q) for q in queries])
+        per_query = (time.perf_counter() - start) / len(queries) * 1000
+
+        start = time.perf_counter()
+        rows, _ = matcher.nearest_batch(queries)
+        per_query_batch = (time.perf_counter() - start) / len(queries) * 1000
+
+        error = np.abs(distances - base_distances)
+        agreement = (distances.argmin(axis=1) == base_top1).mean() * 100
+        print(f"{precision:<10}{matcher.nbytes() / 1024:>10.0f}KB{baseline.nbytes() / matcher.nbytes():>7.1f}x"
+              f"{error.max():>10.5f}{error.mean():>10.5f}{agreement:>12.1f}%{per_query:>10.3f}{per_query_batch:>12.4f}")
+        if (rows != distances.argmin(axis=1)).any():
+            print(f"   ⚠️ {precision}: batch and single-query kernels disagree on {(rows != distances.argmin(axis=1)).sum()} queries")
+
+if __name__ == "__main__":
+    main()
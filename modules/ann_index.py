@@ -0,0 +1,192 @@
+import numpy as np
+
+# إعدادات الفهرس التقريبي (IVF + PQ اختياري)
+DEFAULT_NPROBE = 8          # عدد القوائم التي يتم فحصها لكل بحث
+DEFAULT_RERANK = 32         # عدد المرشحين الذين نحسب لهم المسافة الدقيقة
+KMEANS_ITERATIONS = 10
+PQ_SUBVECTORS = 8           # 128 / 8 = 16 بُعد لكل جزء
+PQ_CENTROIDS = 256
+CHUNK_SIZE = 8192
+
+
+def _squared_distances(x, centroids):
+    """Squared L2 distances (n, k), computed in chunks to bound memory."""
+    c_norms = (centroids ** 2).sum(axis=1)
+    out = np.empty((len(x), len(centroids)), dtype=np.float64)
+    for start in range(0, len(x), CHUNK_SIZE):
+        block = x[start:start + CHUNK_SIZE]
+        d = (block ** 2).sum(axis=1)[:, None] - 2.0 * block @ centroids.T + c_norms[None, :]
+        out[start:start + CHUNK_SIZE] = np.maximum(d, 0)
+    return out
+
+
+def kmeans(x, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """Plain Lloyd k-means. Returns (centroids, assignments)."""
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, len(x)))
+    centroids = x[rng.choice(len(x), k, replace=False)].astype(np.float64)
+    assignments = np.zeros(len(x), dtype=np.int64)
+    for _ in range(iterations):
+        assignments = _squared_distances(x, centroids).argmin(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, x)
+        counts = np.bincount(assignments, minlength=k)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters from random points
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), int(empty.sum()))]
+    return centroids, assignments
+
+
+class ProductQuantizer:
+    """Splits vectors into m sub-vectors and codes each with its own 8-bit codebook."""
+    def __init__(self, m=PQ_SUBVECTORS, ks=PQ_CENTROIDS):
+        self.m = m
+        self.ks = ks
+        self.codebooks = None
+
+    def train(self, x):
+        dim = x.shape[1]
+        if dim % self.m:
+            raise ValueError(f"dimension {dim} is not divisible by {self.m} sub-vectors")
+        self.sub_dim = dim // self.m
+        self.codebooks = []
+        for j in range(self.m):
+            sub = x[:, j * self.sub_dim:(j + 1) * self.sub_dim]
+            centroids, _ = kmeans(sub, self.ks, seed=j)
+            self.codebooks.append(centroids)
+
+    def encode(self, x):
+        codes = np.empty((len(x), self.m), dtype=np.uint8)
+        for j, codebook in enumerate(self.codebooks):
+            sub = x[:, j * self.sub_dim:(j + 1) * self.sub_dim]
+            codes[:, j] = _squared_distances(sub, codebook).argmin(axis=1)
+        return codes
+
+    def distance_table(self, query):
+        """(m, ks) squared distances from each query sub-vector to each code."""
+        table = np.full((self.m, self.ks), np.inf)
+        for j, codebook in enumerate(self.codebooks):
+            sub = query[j * self.sub_dim:(j + 1) * self.sub_dim]
+            table[j, :len(codebook)] = ((codebook - sub) ** 2).sum(axis=1)
+        return table
+
+
+class IVFIndex:
+    """
+    Inverted-file index over the face gallery.
+    Vectors are grouped under k-means centroids; a search only scans the
+    nprobe closest groups, optionally scores them with PQ codes, then
+    re-ranks the best candidates with the exact distance.
+    build(vectors, source=matcher) keeps no copy of the vectors: exact
+    distances read the matcher's rows (e.g. dequantized int8), so the index
+    works on top of a compact gallery.
+    """
+    def __init__(self, nlist=None, nprobe=DEFAULT_NPROBE, rerank=DEFAULT_RERANK, use_pq=False):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.pq = ProductQuantizer() if use_pq else None
+
+        self.vectors = None
+        self.source = None
+        self.size = 0
+        self.dim = None
+        self.centroids = None
+        self.lists = []
+        self.codes = None
+
+    def __len__(self):
+        return self.size
+
+    def _rows(self, indices):
+        if self.source is None:
+            return self.vectors[indices]
+        return np.asarray(self.source.rows(indices), dtype=np.float64)
+
+    def build(self, vectors, source=None):
+        """vectors trains the index; with source (a matcher over the same rows) they are not kept."""
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if len(vectors) == 0:
+            raise ValueError("cannot build an index over an empty gallery")
+        self.size, self.dim = vectors.shape
+        self.source = source
+        self.vectors = vectors if source is None else None
+        nlist = self.nlist or max(1, int(np.sqrt(len(vectors))))
+        self.centroids, assignments = kmeans(vectors, nlist)
+
+        order = np.argsort(assignments, kind='stable')
+        bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+        if self.pq is not None:
+            self.pq.train(vectors)
+            self.codes = self.pq.encode(vectors)
+        return self
+
+    def add(self, vectors):
+        """Incremental insert (e.g. after enrollment) without re-training. A source matcher must already hold them."""
+        vectors = np.asarray(vectors, dtype=np.float64).reshape(-1, self.dim)
+        start = self.size
+        if self.source is None:
+            self.vectors = np.vstack([self.vectors, vectors])
+        self.size += len(vectors)
+        assignments = _squared_distances(vectors, self.centroids).argmin(axis=1)
+        for offset, list_id in enumerate(assignments):
+            self.lists[list_id] = np.append(self.lists[list_id], start + offset)
+        if self.pq is not None:
+            self.codes = np.vstack([self.codes, self.pq.encode(vectors)])
+
+    def nearest_batch(self, queries, nprobe=None):
+        """
+        Nearest stored vector for each query: (rows, distances), row -1 when
+        the probed lists are empty. All queries are probed at once and each
+        list is scanned once for every query that probes it, with exact
+        distances (no PQ shortlist).
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, self.dim)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probes = np.argpartition(_squared_distances(queries, self.centroids), nprobe - 1, axis=1)[:, :nprobe]
+
+        rows = np.full(len(queries), -1, dtype=np.int64)
+        best = np.full(len(queries), np.inf)
+        for list_id in np.unique(probes):
+            members = self.lists[list_id]
+            if len(members) == 0:
+                continue
+            asking = np.nonzero((probes == list_id).any(axis=1))[0]
+            d = _squared_distances(queries[asking], self._rows(members))
+            closest = d.argmin(axis=1)
+            closest_d = d[np.arange(len(asking)), closest]
+            better = closest_d < best[asking]
+            best[asking[better]] = closest_d[better]
+            rows[asking[better]] = members[closest[better]]
+
+        distances = np.full(len(queries), np.inf)
+        found = rows >= 0
+        distances[found] = np.linalg.norm(self._rows(rows[found]) - queries[found], axis=1)
+        return rows, distances
+
+    def search(self, query, k=1, nprobe=None):
+        """Returns (rows, distances) of the k nearest stored vectors, best first."""
+        query = np.asarray(query, dtype=np.float64)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+
+        coarse = ((self.centroids - query) ** 2).sum(axis=1)
+        probe = np.argpartition(coarse, nprobe - 1)[:nprobe]
+        candidates = np.concatenate([self.lists[i] for i in probe])
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        if self.pq is not None and len(candidates) > self.rerank:
+            table = self.pq.distance_table(query)
+            approx = table[np.arange(self.pq.m), self.codes[candidates]].sum(axis=1)
+            keep = np.argpartition(approx, self.rerank - 1)[:self.rerank]
+            candidates = candidates[keep]
+
+        distances = np.linalg.norm(self._rows(candidates) - query, axis=1)
+        k = min(k, len(candidates))
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best])]
+        return candidates[best], distances[best]
@@ -1,24 +1,30 @@
 import cv2
-import face_recognition
 import numpy as np
 from modules import db_manager
+from modules.stream_encoder import StreamEncoder
+from modules.frame_pool import FramePool
+from modules.liveness import LivenessTracker
+from modules.gallery import Gallery, SHARED_REFRESH_SECONDS
+from modules.face_detector import FaceDetector
+from modules import face_crops
+from modules import evidence
+from modules import tracing
 import time
-from scipy.spatial import distance as dist
+
+RECOGNITION_INTERVAL = 3    # التعرف الكامل كل 3 إطارات
+LANDMARK_INTERVAL = 1       # تحديث نقاط العين (للرمش) كل إطار
 
 class VideoCamera:
     def __init__(self):
         self.video = cv2.VideoCapture(0)
         self.video.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         
-        self.users = db_manager.get_all_embeddings()
-        self.known_face_encodings = [user["encoding"] for user in self.users]
-        self.known_face_names = [user["name"] for user in self.users]
-        self.known_face_ids = [user["id"] for user in self.users]
+        self.gallery = Gallery()
+        self.gallery_checked = time.time()
+        self.detector = FaceDetector()
         
-        self.last_attendance = {}
-        self.blink_counter = 0
-        self.consecutive_frames = 2
-        self.eye_aspect_ratio_threshold = 0.23
+        self.liveness = LivenessTracker(threshold=0.23, consecutive_frames=2)
+        self.tracked_locations = []
         
         self.frame_counter = 0
         
@@ -27,94 +33,108 @@ class VideoCamera:
         self.last_statuses = []
         self.last_colors = []
 
+        self.encoder = StreamEncoder()
+        self.pool = FramePool()     # الإطار والنسخ المصغرة تُعاد كتابتها في نفس الذاكرة كل مرة
+        self.on_event = None    # callback(dict), used by the recognition worker
+
     def __del__(self):
         self.video.release()
 
-    def get_eye_aspect_ratio(self, eye):
-        A = dist.euclidean(eye[1], eye[5])
-        B = dist.euclidean(eye[2], eye[4])
-        C = dist.euclidean(eye[0], eye[3])
-        return (A + B) / (2.0 * C)
+    def refresh_gallery(self):
+        """Reloads the gallery when the DB version moves on (enrollments, deletions, imports from other processes)."""
+        now = time.time()
+        if now - self.gallery_checked < SHARED_REFRESH_SECONDS:
+            return
+        self.gallery_checked = now
+        if db_manager.get_gallery_version() != self.gallery.version:
+            with tracing.span("gallery_reload"):
+                self.gallery = Gallery()
 
+    @tracing.traced("VideoCamera.get_frame")
     def get_frame(self):
-        success, frame = self.video.read()
+        with tracing.span("capture"):
+            success, frame = self.pool.read(self.video)
         if not success: return None
 
         self.frame_counter += 1
+        is_recognition_frame = self.frame_counter % RECOGNITION_INTERVAL == 0
+        is_landmark_frame = self.frame_counter % LANDMARK_INTERVAL == 0
         
-        if self.frame_counter % 3 == 0:
+        if is_recognition_frame:
+            # Only detection needs the small frame; encodings and landmarks use full-resolution crops
+            with tracing.span("resize"):
+                small_frame = self.pool.resize('small', frame, fx=0.25)
+                rgb_small_frame = self.pool.to_rgb('rgb_small', small_frame)
+
+        if not is_recognition_frame and is_landmark_frame and self.tracked_locations:
+            # Landmark-only pass on the last known boxes so blinks between recognition frames are not missed
+            with tracing.span("landmarks"):
+                face_landmarks_list = face_crops.face_landmarks(frame, self.tracked_locations)
+                self.liveness.update(self.tracked_locations, face_landmarks_list)
+
+        if is_recognition_frame:
+            self.refresh_gallery()
             self.last_locations = []
             self.last_names = []
             self.last_statuses = []
             self.last_colors = []
             
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            
-            face_locations = face_recognition.face_locations(rgb_small_frame)
+            with tracing.span("detect"):
+                face_locations = self.detector.detect(rgb_small_frame, hints=self.tracked_locations)
+            self.tracked_locations = face_locations
             
             if len(face_locations) > 0:
-                face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-                face_landmarks_list = face_recognition.face_landmarks(rgb_small_frame, face_locations)
+                with tracing.span("encode", faces=len(face_locations)):
+                    face_encodings, face_landmarks_list = face_crops.encode_faces(frame, face_locations)
+                with tracing.span("liveness"):
+                    track_ids = self.liveness.update(face_locations, face_landmarks_list)
                 
                 face_encoding = face_encodings[0]
                 face_loc = face_locations[0] 
                 
-                matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding, tolerance=0.5)
-                face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
+                with tracing.span("match"):
+                    user_id, match_name, _ = self.gallery.match(face_encoding, tolerance=0.5)
                 
                 name = "Unknown"
                 status_text = "Scanning..."
                 color = (0, 255, 255) 
 
-                if len(face_distances) > 0:
-                    best_match_index = np.argmin(face_distances)
-                    if matches[best_match_index]:
-                        name = self.known_face_names[best_match_index]
-                        user_id = self.known_face_ids[best_match_index]
-                        
-                        is_blink = False
-                        if len(face_landmarks_list) > 0:
-                            landmarks = face_landmarks_list[0]
-                            left_ear = self.get_eye_aspect_ratio(landmarks['left_eye'])
-                            right_ear = self.get_eye_aspect_ratio(landmarks['right_eye'])
-                            avg_ear = (left_ear + right_ear) / 2.0
-                            
-                            if avg_ear < self.eye_aspect_ratio_threshold:
-                                self.blink_counter += 1
-                            else:
-                                if self.blink_counter >= self.consecutive_frames:
-                                    is_blink = True
-                                self.blink_counter = 0
+                if user_id is not None:
+                    name = match_name
+                    
+                    is_blink = self.liveness.consume_blink(track_ids[0])
 
-                        if is_blink:
-                            current_time = time.time()
-                            if user_id not in self.last_attendance or (current_time - self.last_attendance[user_id] > 60):
-                                db_manager.mark_attendance(user_id)
-                                self.last_attendance[user_id] = current_time
-                                status_text = f"WELCOME {name}"
-                                color = (0, 255, 0)
-                            else:
-                                status_text = f"ALREADY MARKED"
-                                color = (0, 255, 0)
+                    if is_blink:
+                        # Cooldown is enforced by db_manager (None = already marked in this window)
+                        attendance_id = db_manager.mark_attendance(user_id)
+                        if attendance_id is not None:
+                            evidence.get_writer().submit(frame, tuple(v * 4 for v in face_loc), attendance_id, user_id)
+                            if self.on_event:
+                                self.on_event({"type": "attendance", "user_id": user_id, "name": name, "time": time.time()})
+                            status_text = f"WELCOME {name}"
+                            color = (0, 255, 0)
                         else:
-                            status_text = "PLEASE BLINK"
-                            color = (0, 165, 255)
+                            status_text = f"ALREADY MARKED"
+                            color = (0, 255, 0)
+                    else:
+                        status_text = "PLEASE BLINK"
+                        color = (0, 165, 255)
 
                 self.last_locations.append(face_loc)
                 self.last_names.append(name)
                 self.last_statuses.append(status_text)
                 self.last_colors.append(color)
 
-        for (top, right, bottom, left), name, status, color in zip(self.last_locations, self.last_names, self.last_statuses, self.last_colors):
-            top *= 4
-            right *= 4
-            bottom *= 4
-            left *= 4
-            
-            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-            cv2.putText(frame, status, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-            cv2.putText(frame, name, (left, bottom + 30), cv2.FONT_HERSHEY_DUPLEX, 1.0, (255, 255, 255), 1)
+        with tracing.span("draw"):
+            for (top, right, bottom, left), name, status, color in zip(self.last_locations, self.last_names, self.last_statuses, self.last_colors):
+                top *= 4
+                right *= 4
+                bottom *= 4
+                left *= 4
+                
+                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+                cv2.putText(frame, status, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+                cv2.putText(frame, name, (left, bottom + 30), cv2.FONT_HERSHEY_DUPLEX, 1.0, (255, 255, 255), 1)
 
-        ret, jpeg = cv2.imencode('.jpg', frame)
-        return jpeg.tobytes()
\ No newline at end of file
+        with tracing.span("jpeg"):
+            return self.encoder.encode(frame, force=is_recognition_frame)
\ No newline at end of file
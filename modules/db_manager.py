@@ -1,14 +1,30 @@
 import sqlite3
 import os
+import time
+import threading
 import pickle
-from datetime import datetime
+import json
+import re
+import socket
+import hashlib
+from datetime import datetime, timedelta
 import csv # مهم جداً للأرشفة
-import calendar
+import numpy as np
 
 # إعداد المسارات
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_DIR = os.path.dirname(CURRENT_DIR)
 DB_PATH = os.path.join(BASE_DIR, 'database', 'attendance.db')
+SNAPSHOT_DIR = os.path.join(BASE_DIR, 'database', 'snapshot')
+SNAPSHOT_PRECISION = 'float64'  # 'float16' أو 'int8' لتقليل الذاكرة 4-8 مرات
+
+# أقل مدة بين تسجيلين لنفس الموظف (مطبقة في قاعدة البيانات لكل العمليات)
+ATTENDANCE_COOLDOWN_SECONDS = 60
+# الأحداث الأقدم من هذا تُدمج في فترات حضور (نفس مدة الاحتفاظ بصور الإثبات)
+COMPACT_AFTER_DAYS = 90
+INTERVAL_GAP_MINUTES = 30   # فجوة أطول من هذا بين تسجيلين تبدأ فترة جديدة
+_recent_marks = {}      # user_id -> آخر bucket تم تسجيله في هذه العملية
+_recent_marks_lock = threading.Lock()
 
 def get_db_connection():
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
@@ -42,9 +58,127 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
+    # bucket = وقت التسجيل / مدة التبريد: صف واحد فقط لكل موظف في كل فترة
+    columns = [row['name'] for row in cursor.execute('PRAGMA table_info(attendance)')]
+    if 'bucket' not in columns:
+        cursor.execute('ALTER TABLE attendance ADD COLUMN bucket INTEGER')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_user_bucket ON attendance (user_id, bucket)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_user_timestamp ON attendance (user_id, timestamp)')
+    # فهارس للقوائم المقسمة إلى صفحات
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_timestamp ON attendance (timestamp, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_faces_user ON faces (user_id)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS evidence (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            attendance_id INTEGER NOT NULL,
+            face_path TEXT NOT NULL,
+            context_path TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (attendance_id) REFERENCES attendance (id)
+        )
+    ''')
+    # الأحداث القديمة بعد الدمج: فترة لكل موظف (أول وآخر تسجيل وعددها)، لا تتجاوز اليوم
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_intervals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            marks INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_intervals_start ON attendance_intervals (start_time, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_intervals_user ON attendance_intervals (user_id)')
+    # Reports read both through this view; a raw row is an interval of one mark.
+    # Interval ids are negated so (start_time, id) stays unique for keyset paging.
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS attendance_all AS
+        SELECT id, user_id, timestamp AS start_time, timestamp AS end_time, 1 AS marks FROM attendance
+        UNION ALL
+        SELECT -id, user_id, start_time, end_time, marks FROM attendance_intervals
+    ''')
+    # رقم نسخة المعرض: يزيد تلقائياً مع أي تغيير في الوجوه أو الأسماء
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('gallery_version', 0)")
+
+    # مزامنة المعرض بين الأجهزة: معرف ثابت لكل موظف + رقم آخر نسخة تغير فيها
+    columns = [row['name'] for row in cursor.execute('PRAGMA table_info(users)')]
+    if 'uid' not in columns:
+        cursor.execute('ALTER TABLE users ADD COLUMN uid TEXT')
+    if 'version' not in columns:
+        cursor.execute('ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+    # Existing employees get a uid derived from their row, so copies of the same
+    # database migrated on different nodes still agree on who is who
+    for row in cursor.execute('SELECT id, name FROM users WHERE uid IS NULL').fetchall():
+        cursor.execute('UPDATE users SET uid = ? WHERE id = ?', (_legacy_uid(cursor, row['id'], row['name']), row['id']))
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_uid ON users (uid)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_version ON users (version)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS gallery_tombstones (
+            uid TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+    # node_id belongs to this database file on this machine: a copied file
+    # (new host, path or inode) gets a new one instead of posing as its source
+    fingerprint = _db_fingerprint()
+    row = cursor.execute("SELECT value FROM sync_state WHERE key = 'node_fingerprint'").fetchone()
+    if row is None or row['value'] != fingerprint:
+        cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('node_id', lower(hex(randomblob(16))))")
+        cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('node_fingerprint', ?)", (fingerprint,))
+
+    # One trigger per event bumps the version and stamps the employee in that order
+    # (replaces the older *_gallery_version triggers, whose firing order was not defined)
+    bump = "UPDATE meta SET value = value + 1 WHERE key = 'gallery_version';"
+    stamp = "UPDATE users SET version = (SELECT value FROM meta WHERE key = 'gallery_version') WHERE id = {};"
+    for name, event, body in [
+            ('faces_insert', 'INSERT ON faces', bump + stamp.format('NEW.user_id')),
+            ('faces_update', 'UPDATE ON faces', bump + stamp.format('NEW.user_id')),
+            ('faces_delete', 'DELETE ON faces', bump + stamp.format('OLD.user_id')),
+            ('users_update', 'UPDATE OF name ON users', bump + stamp.format('NEW.id')),
+            ('users_delete', 'DELETE ON users', bump + '''
+                INSERT OR REPLACE INTO gallery_tombstones (uid, version)
+                SELECT OLD.uid, value FROM meta WHERE key = 'gallery_version' AND OLD.uid IS NOT NULL;''')]:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}_gallery_version')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {name}_gallery_sync AFTER {event}
+            BEGIN
+                {body}
+            END
+        ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_insert_uid AFTER INSERT ON users WHEN NEW.uid IS NULL
+        BEGIN
+            UPDATE users SET uid = lower(hex(randomblob(16))) WHERE id = NEW.id;
+        END
+    ''')
     conn.commit()
     conn.close()
 
+def _legacy_uid(cursor, user_id, name):
+    """Deterministic uid for an employee enrolled before uids existed: hash of id, name and first face."""
+    digest = hashlib.sha256(f"{user_id}:{name}".encode('utf-8'))
+    row = cursor.execute('SELECT encoding FROM faces WHERE user_id = ? ORDER BY id LIMIT 1', (user_id,)).fetchone()
+    if row is not None:
+        digest.update(np.asarray(pickle.loads(row['encoding']), dtype=np.float64).tobytes())
+    return digest.hexdigest()[:32]
+
+def _db_fingerprint():
+    path = os.path.realpath(DB_PATH)
+    return f"{socket.gethostname()}:{path}:{os.stat(path).st_ino}"
+
 def add_user_with_encodings(name, encodings_list):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -63,16 +197,62 @@ def add_user_with_encodings(name, encodings_list):
     finally:
         conn.close()
 
-def get_all_embeddings():
+def add_users_bulk(users):
+    """
+    users: list of (name, encodings_list). Everything is inserted in one transaction.
+    Returns the new user ids (empty list on failure).
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
+    try:
+        user_ids = []
+        for name, encodings_list in users:
+            cursor.execute('INSERT INTO users (name) VALUES (?)', (name,))
+            user_id = cursor.lastrowid
+            cursor.executemany('INSERT INTO faces (user_id, encoding) VALUES (?, ?)',
+                               [(user_id, pickle.dumps(encoding)) for encoding in encodings_list])
+            user_ids.append(user_id)
+        conn.commit()
+        return user_ids
+    except Exception as e:
+        print(f"[ERROR] Bulk insert failed: {e}")
+        conn.rollback()
+        return []
+    finally:
+        conn.close()
+
+def get_last_user_id():
+    conn = get_db_connection()
+    row = conn.execute('SELECT MAX(id) AS id FROM users').fetchone()
+    conn.close()
+    return row['id'] or 0
+
+def get_user_ids_by_name(names, after_id=0):
+    """{name: newest id} for users named in names with an id above after_id."""
+    conn = get_db_connection()
+    result = {}
+    for name in names:
+        row = conn.execute('SELECT MAX(id) AS id FROM users WHERE name = ? AND id > ?', (name, after_id)).fetchone()
+        if row['id'] is not None:
+            result[name] = row['id']
+    conn.close()
+    return result
+
+def _select_embeddings(cursor):
     cursor.execute('''
         SELECT u.id, u.name, f.encoding 
         FROM users u
         JOIN faces f ON u.id = f.user_id
     ''')
-    rows = cursor.fetchall()
+    return cursor.fetchall()
+
+def get_all_embeddings():
+    conn = get_db_connection()
+    rows = _select_embeddings(conn.cursor())
     conn.close()
+    return _embeddings_from_rows(rows)
+
+def _embeddings_from_rows(rows):
     embeddings_data = []
     for row in rows:
         embeddings_data.append({
@@ -82,19 +262,285 @@ def get_all_embeddings():
         })
     return embeddings_data
 
-def mark_attendance(user_id):
+def get_all_faces():
+    """Like get_all_embeddings but one entry per stored sample, with its face id."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor.execute('''
+        SELECT f.id as face_id, u.id, u.name, f.encoding
+        FROM users u
+        JOIN faces f ON u.id = f.user_id
+        ORDER BY f.id
+    ''')
+    rows = cursor.fetchall()
+    conn.close()
+    return [{"face_id": row["face_id"], "id": row["id"], "name": row["name"], "encoding": pickle.loads(row["encoding"])}
+            for row in rows]
+
+def get_sync_value(key, default=None):
+    conn = get_db_connection()
+    row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+    conn.close()
+    return row['value'] if row else default
+
+def set_sync_value(key, value):
+    conn = get_db_connection()
+    conn.execute('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)', (key, str(value)))
+    conn.commit()
+    conn.close()
+
+def get_gallery_changes(since_version=None):
+    """
+    Employees changed after since_version (all of them when None), each with all
+    of its encodings, plus the employees deleted after it.
+    Returns (gallery_version, users, tombstones); one consistent read.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    try:
+        cursor.execute("SELECT value FROM meta WHERE key = 'gallery_version'")
+        version = cursor.fetchone()['value']
+        since = -1 if since_version is None else since_version
+        cursor.execute('''
+            SELECT u.id, u.uid, u.name, u.version, f.encoding
+            FROM users u
+            LEFT JOIN faces f ON u.id = f.user_id
+            WHERE u.version > ?
+            ORDER BY u.id, f.id
+        ''', (since,))
+        users = {}
+        for row in cursor.fetchall():
+            user = users.setdefault(row['id'], {"uid": row['uid'], "name": row['name'],
+                                                "version": row['version'], "encodings": []})
+            if row['encoding'] is not None:
+                user["encodings"].append(pickle.loads(row['encoding']))
+        tombstones = []
+        if since_version is not None:
+            cursor.execute('SELECT uid, version FROM gallery_tombstones WHERE version > ? ORDER BY version', (since,))
+            tombstones = [{"uid": row['uid'], "version": row['version']} for row in cursor.fetchall()]
+    finally:
+        conn.rollback()
+        conn.close()
+    return version, list(users.values()), tombstones
+
+def apply_gallery_changes(users, tombstones):
+    """
+    Merges employees from another node, matched by uid: new ones are added,
+    existing ones get the incoming name and their faces replaced. Then the
+    tombstones delete employees (like delete_user). One transaction.
+    Returns {"added", "updated", "unchanged", "deleted"} or None on failure.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    counts = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0}
     try:
-        cursor.execute('INSERT INTO attendance (user_id, timestamp) VALUES (?, ?)', (user_id, now))
+        for user in users:
+            row = cursor.execute('SELECT id, name FROM users WHERE uid = ?', (user["uid"],)).fetchone()
+            if row is None:
+                cursor.execute('INSERT INTO users (name, uid) VALUES (?, ?)', (user["name"], user["uid"]))
+                user_id = cursor.lastrowid
+                cursor.execute('DELETE FROM gallery_tombstones WHERE uid = ?', (user["uid"],))
+                counts["added"] += 1
+            else:
+                user_id = row['id']
+                current = [pickle.loads(r['encoding']) for r in cursor.execute(
+                    'SELECT encoding FROM faces WHERE user_id = ? ORDER BY id', (user_id,))]
+                # Our own employees coming back through another node: leave them (and their version) alone
+                if row['name'] == user["name"] and len(current) == len(user["encodings"]) and \
+                        (not current or np.allclose(current, user["encodings"], atol=1e-6)):
+                    counts["unchanged"] += 1
+                    continue
+                if row['name'] != user["name"]:
+                    cursor.execute('UPDATE users SET name = ? WHERE id = ?', (user["name"], user_id))
+                cursor.execute('DELETE FROM faces WHERE user_id = ?', (user_id,))
+                counts["updated"] += 1
+            cursor.executemany('INSERT INTO faces (user_id, encoding) VALUES (?, ?)',
+                               [(user_id, pickle.dumps(encoding)) for encoding in user["encodings"]])
+        for tombstone in tombstones:
+            row = cursor.execute('SELECT id FROM users WHERE uid = ?', (tombstone["uid"],)).fetchone()
+            if row is None:
+                continue
+            cursor.execute('DELETE FROM faces WHERE user_id = ?', (row['id'],))
+            cursor.execute('DELETE FROM attendance WHERE user_id = ?', (row['id'],))
+            cursor.execute('DELETE FROM attendance_intervals WHERE user_id = ?', (row['id'],))
+            cursor.execute('DELETE FROM users WHERE id = ?', (row['id'],))
+            counts["deleted"] += 1
         conn.commit()
+        return counts
+    except Exception as e:
+        print(f"[ERROR] Gallery import failed: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+def get_gallery_version():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM meta WHERE key = 'gallery_version'")
+    row = cursor.fetchone()
+    conn.close()
+    return row['value'] if row else 0
+
+def get_versioned_embeddings():
+    """(gallery_version, get_all_embeddings()) from one read transaction, so they always match."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    try:
+        cursor.execute("SELECT value FROM meta WHERE key = 'gallery_version'")
+        row = cursor.fetchone()
+        rows = _select_embeddings(cursor)
+    finally:
+        conn.rollback()
+        conn.close()
+    return (row['value'] if row else 0), _embeddings_from_rows(rows)
+
+def _snapshot_paths(version):
+    base = os.path.join(SNAPSHOT_DIR, f'gallery_v{version}')
+    return base + '.npy', base + '.json'
+
+def build_gallery_snapshot(precision=None):
+    """
+    Writes the gallery as an .npy matrix plus an id/name sidecar for the current version.
+    precision: 'float64', 'float16' or 'int8' (int8 offset/scale go in the sidecar).
+    """
+    from modules.quantization import quantize_int8
+
+    precision = precision or SNAPSHOT_PRECISION
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    version, users = get_versioned_embeddings()
+    if users:
+        encodings = np.array([user["encoding"] for user in users], dtype=np.float64)
+    else:
+        encodings = np.empty((0, 128), dtype=np.float64)
+    meta = {
+        "version": version,
+        "precision": precision,
+        "ids": [user["id"] for user in users],
+        "names": [user["name"] for user in users],
+    }
+    if precision == 'float16':
+        encodings = encodings.astype(np.float16)
+    elif precision == 'int8':
+        if len(encodings):
+            encodings, offset, scale = quantize_int8(encodings)
+        else:
+            encodings, offset, scale = np.empty((0, 128), dtype=np.int8), np.zeros(128), np.ones(128)
+        meta["offset"] = [float(v) for v in offset]
+        meta["scale"] = [float(v) for v in scale]
+
+    npy_path, json_path = _snapshot_paths(version)
+    # Write to temp files and rename, so readers never see a half-written snapshot
+    tmp_suffix = f'.tmp{os.getpid()}'
+    with open(npy_path + tmp_suffix, 'wb') as f:
+        np.save(f, encodings)
+    with open(json_path + tmp_suffix, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(npy_path + tmp_suffix, npy_path)
+    os.replace(json_path + tmp_suffix, json_path)
+
+    # Only older versions: a newer one may have just been written by another process.
+    # Old versions may still be mapped by another process (Windows refuses to delete them)
+    for filename in os.listdir(SNAPSHOT_DIR):
+        match = re.match(r'gallery_v(\d+)\.', filename)
+        if match and int(match.group(1)) < version:
+            try:
+                os.remove(os.path.join(SNAPSHOT_DIR, filename))
+            except OSError:
+                pass
+    return version
+
+def load_gallery_snapshot():
+    """
+    Returns {"version", "precision", "ids", "names", "encodings"} (+ "offset"/"scale"
+    for int8) with encodings memory-mapped read-only. The snapshot is rebuilt only
+    when the gallery version moved on or SNAPSHOT_PRECISION changed.
+    """
+    init_db()
+    version = get_gallery_version()
+    npy_path, json_path = _snapshot_paths(version)
+    if not (os.path.exists(npy_path) and os.path.exists(json_path)):
+        build_gallery_snapshot()
+    try:
+        with open(json_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("precision", 'float64') != SNAPSHOT_PRECISION:
+            raise ValueError("snapshot precision changed")
+        encodings = np.load(npy_path, mmap_mode='r')
+    except (OSError, ValueError):
+        version = build_gallery_snapshot()
+        npy_path, json_path = _snapshot_paths(version)
+        with open(json_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        encodings = np.load(npy_path, mmap_mode='r')
+    meta["encodings"] = encodings
+    return meta
+
+def mark_attendance(user_id, when=None):
+    """
+    Records attendance unless the user already has a mark less than
+    ATTENDANCE_COOLDOWN_SECONDS away (a rolling window, checked inside the
+    INSERT so it holds across every camera, viewer and process). The
+    (user_id, bucket) unique index is only a backstop. Returns the new row id,
+    or None if the user was already marked.
+    when: datetime of the event (default now), e.g. when replaying recorded footage.
+    """
+    if when is None:
+        when = datetime.now()
+    bucket = int(when.timestamp() // ATTENDANCE_COOLDOWN_SECONDS)
+    with _recent_marks_lock:
+        if _recent_marks.get(user_id) == bucket:
+            return None
+        _recent_marks[user_id] = bucket
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    now = when.strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        cooldown = timedelta(seconds=ATTENDANCE_COOLDOWN_SECONDS)
+        cursor.execute('''
+            INSERT OR IGNORE INTO attendance (user_id, timestamp, bucket)
+            SELECT ?, ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM attendance WHERE user_id = ? AND timestamp > ? AND timestamp < ?)
+        ''', (user_id, now, bucket, user_id,
+              (when - cooldown).strftime("%Y-%m-%d %H:%M:%S"), (when + cooldown).strftime("%Y-%m-%d %H:%M:%S")))
+        conn.commit()
+        if cursor.rowcount == 0:
+            return None
         print(f"[LOG] Attendance: User {user_id} at {now}")
+        return cursor.lastrowid
     except Exception as e:
         print(f"[ERROR] Mark attendance failed: {e}")
+        with _recent_marks_lock:
+            _recent_marks.pop(user_id, None)
+        return None
+    finally:
+        conn.close()
+
+def add_evidence(attendance_id, face_path, context_path):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('INSERT INTO evidence (attendance_id, face_path, context_path) VALUES (?, ?, ?)',
+                       (attendance_id, face_path, context_path))
+        conn.commit()
+    except Exception as e:
+        print(f"[ERROR] Saving evidence failed: {e}")
     finally:
         conn.close()
 
+def delete_evidence_files(paths):
+    """Drops evidence rows whose face or context image was removed by the retention policy."""
+    if not paths:
+        return
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.executemany('DELETE FROM evidence WHERE face_path = ? OR context_path = ?', [(p, p) for p in paths])
+    conn.commit()
+    conn.close()
+
 def get_recent_attendance():
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -113,10 +559,10 @@ def get_attendance_report():
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('''
-        SELECT users.name, attendance.timestamp 
-        FROM attendance 
-        JOIN users ON attendance.user_id = users.id 
-        ORDER BY attendance.timestamp DESC
+        SELECT users.name, a.start_time AS timestamp, a.end_time, a.marks
+        FROM attendance_all a
+        JOIN users ON a.user_id = users.id
+        ORDER BY a.start_time DESC
     ''')
     rows = cursor.fetchall()
     conn.close()
@@ -135,12 +581,114 @@ def get_users_list():
     conn.close()
     return rows
 
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def _page_limit(limit):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+class InvalidCursor(ValueError):
+    """A ?cursor= value that this module did not produce."""
+
+def _parse_users_cursor(cursor_id):
+    if not cursor_id:
+        return 0
+    try:
+        return int(cursor_id)
+    except (TypeError, ValueError):
+        raise InvalidCursor(f"invalid cursor: {cursor_id!r}")
+
+def _parse_attendance_cursor(cursor_key):
+    timestamp, sep, row_id = str(cursor_key).rpartition('|')
+    try:
+        if not sep or not timestamp:
+            raise ValueError
+        return timestamp, int(row_id)
+    except ValueError:
+        raise InvalidCursor(f"invalid cursor: {cursor_key!r}")
+
+def get_users_page(cursor_id=None, limit=PAGE_SIZE, name=None):
+    """
+    Keyset page of employees ordered by id. cursor_id is the last id of the
+    previous page. Face counts are computed only for the returned rows.
+    Returns (rows, next_cursor or None). Raises InvalidCursor for a malformed cursor.
+    """
+    limit = _page_limit(limit)
+    params = [_parse_users_cursor(cursor_id)]
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    where = ['u.id > ?']
+    if name:
+        where.append('u.name LIKE ?')
+        params.append(f'%{name}%')
+    cursor.execute(f'''
+        SELECT u.id, u.name, u.created_at,
+               (SELECT COUNT(*) FROM faces f WHERE f.user_id = u.id) as face_count
+        FROM users u
+        WHERE {' AND '.join(where)}
+        ORDER BY u.id
+        LIMIT ?
+    ''', params + [limit + 1])
+    rows = cursor.fetchall()
+    conn.close()
+
+    next_cursor = str(rows[limit - 1]['id']) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def get_attendance_page(cursor_key=None, limit=PAGE_SIZE, name=None, date_from=None, date_to=None):
+    """
+    Keyset page of attendance, newest first. cursor_key is 'timestamp|id' of the
+    last row of the previous page. date_from/date_to are 'YYYY-MM-DD' (inclusive).
+    Compacted intervals come back as one row (negative id) with their end_time
+    and marks; raw rows have end_time = timestamp and marks = 1.
+    Returns (rows, next_cursor or None). Raises InvalidCursor for a malformed cursor.
+    """
+    limit = _page_limit(limit)
+    where = []
+    params = []
+    if cursor_key:
+        where.append('(a.start_time, a.id) < (?, ?)')
+        params += list(_parse_attendance_cursor(cursor_key))
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    if name:
+        where.append('users.name LIKE ?')
+        params.append(f'%{name}%')
+    if date_from:
+        where.append('a.start_time >= ?')
+        params.append(date_from)
+    if date_to:
+        # '~' sorts after every time string, so the whole end day is included
+        where.append('a.start_time < ?')
+        params.append(f'{date_to}~')
+    cursor.execute(f'''
+        SELECT a.id, a.user_id, users.name, a.start_time AS timestamp, a.end_time, a.marks
+        FROM attendance_all a
+        JOIN users ON a.user_id = users.id
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY a.start_time DESC, a.id DESC
+        LIMIT ?
+    ''', params + [limit + 1])
+    rows = cursor.fetchall()
+    conn.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = f"{last['timestamp']}|{last['id']}"
+    return rows[:limit], next_cursor
+
 def delete_user(user_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         cursor.execute('DELETE FROM faces WHERE user_id = ?', (user_id,))
         cursor.execute('DELETE FROM attendance WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM attendance_intervals WHERE user_id = ?', (user_id,))
         cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
         conn.commit()
         return True
@@ -168,8 +716,8 @@ def get_monthly_stats():
     cursor = conn.cursor()
     # تجميع حسب السنة والشهر
     query = '''
-        SELECT strftime('%Y-%m', timestamp) as month, COUNT(DISTINCT user_id) as count 
-        FROM attendance 
+        SELECT substr(start_time, 1, 7) as month, COUNT(DISTINCT user_id) as count
+        FROM attendance_all
         GROUP BY month 
         ORDER BY month DESC 
         LIMIT 6
@@ -188,7 +736,7 @@ def get_monthly_stats():
 def get_available_months():
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT strftime('%Y-%m', timestamp) as month FROM attendance ORDER BY month DESC")
+    cursor.execute("SELECT DISTINCT substr(start_time, 1, 7) as month FROM attendance_all ORDER BY month DESC")
     rows = cursor.fetchall()
     conn.close()
     return [row['month'] for row in rows]
@@ -197,12 +745,12 @@ def get_attendance_by_month(month_str):
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('''
-        SELECT users.name, attendance.timestamp 
-        FROM attendance 
-        JOIN users ON attendance.user_id = users.id 
-        WHERE strftime('%Y-%m', attendance.timestamp) = ?
-        ORDER BY attendance.timestamp DESC
-    ''', (month_str,))
+        SELECT users.name, a.start_time AS timestamp, a.end_time, a.marks
+        FROM attendance_all a
+        JOIN users ON a.user_id = users.id
+        WHERE a.start_time >= ? AND a.start_time < ?
+        ORDER BY a.start_time DESC
+    ''', (month_str, f'{month_str}~'))
     rows = cursor.fetchall()
     conn.close()
     return rows
@@ -216,9 +764,10 @@ def archive_and_clear():
     cursor = conn.cursor()
     
     cursor.execute('''
-        SELECT users.name, attendance.timestamp 
-        FROM attendance 
-        JOIN users ON attendance.user_id = users.id 
+        SELECT users.name, a.start_time, a.end_time
+        FROM attendance_all a
+        JOIN users ON a.user_id = users.id
+        ORDER BY a.start_time
     ''')
     rows = cursor.fetchall()
     
@@ -233,13 +782,64 @@ def archive_and_clear():
         writer = csv.writer(f)
         writer.writerow(['Name', 'Timestamp'])
         for row in rows:
-            writer.writerow([row['name'], row['timestamp']])
+            writer.writerow([row['name'], row['start_time']])
+            # A compacted interval keeps its first and last mark
+            if row['end_time'] != row['start_time']:
+                writer.writerow([row['name'], row['end_time']])
             
     cursor.execute('DELETE FROM attendance')
+    cursor.execute('DELETE FROM attendance_intervals')
     conn.commit()
     conn.close()
     return filename
 
+def compact_attendance(older_than_days=COMPACT_AFTER_DAYS, gap_minutes=INTERVAL_GAP_MINUTES, today=None):
+    """
+    Collapses raw attendance rows from before (today - older_than_days) into
+    presence intervals: one row per employee per stretch of marks no more than
+    gap_minutes apart, never crossing midnight. The first and last mark of every
+    day are kept exactly. Whole days only, and never today.
+    Evidence rows of the compacted marks are dropped (the image files stay).
+    Returns {"events", "intervals", "before"} or None on failure.
+    """
+    today = today or datetime.now().date()
+    before = (today - timedelta(days=max(0, older_than_days))).isoformat()
+    gap = timedelta(minutes=gap_minutes)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT user_id, timestamp FROM attendance WHERE timestamp < ? ORDER BY user_id, timestamp',
+                       (before,))
+        intervals = []
+        current = None     # [user_id, start, end, marks, end_datetime]
+        events = 0
+        for user_id, timestamp in cursor:
+            events += 1
+            when = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+            if current and current[0] == user_id and timestamp[:10] == current[1][:10] and when - current[4] <= gap:
+                current[2], current[3], current[4] = timestamp, current[3] + 1, when
+            else:
+                if current:
+                    intervals.append(tuple(current[:4]))
+                current = [user_id, timestamp, timestamp, 1, when]
+        if current:
+            intervals.append(tuple(current[:4]))
+
+        cursor.executemany('INSERT INTO attendance_intervals (user_id, start_time, end_time, marks) VALUES (?, ?, ?, ?)',
+                           intervals)
+        cursor.execute('DELETE FROM evidence WHERE attendance_id IN (SELECT id FROM attendance WHERE timestamp < ?)',
+                       (before,))
+        cursor.execute('DELETE FROM attendance WHERE timestamp < ?', (before,))
+        conn.commit()
+        return {"events": events, "intervals": len(intervals), "before": before}
+    except Exception as e:
+        print(f"[ERROR] Attendance compaction failed: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
 # دالة جديدة: تعديل بيانات الموظف
 def update_user(user_id, new_name):
     conn = get_db_connection()
@@ -266,10 +866,10 @@ def get_dashboard_stats(selected_month=None):
 
     # إحصائيات الشهر المحدد
     cursor.execute('''
-        SELECT COUNT(DISTINCT user_id) 
-        FROM attendance 
-        WHERE strftime('%Y-%m', timestamp) = ?
-    ''', (selected_month,))
+        SELECT COUNT(DISTINCT user_id)
+        FROM attendance_all
+        WHERE start_time >= ? AND start_time < ?
+    ''', (selected_month, f'{selected_month}~'))
     monthly_attendance = cursor.fetchone()[0]
 
     # إجمالي الموظفين
@@ -317,51 +917,34 @@ def get_daily_status():
             
     return {"present": present_list, "absent": absent_list}
 
-def get_detailed_monthly_report_data(month_str):
+def get_daily_spans(date_from, date_to):
     """
-    Calculates detailed stats for CSV: Name, Days Present, Days Absent
-    month_str format: 'YYYY-MM'
+    One row per employee per day in [date_from, date_to) ('YYYY-MM-DD'):
+    user_id, first_in, last_out, marks. A range scan on the timestamp index of
+    the raw and the compacted rows, ordered by employee and day.
     """
     conn = get_db_connection()
     cursor = conn.cursor()
-    
-    # 1. Get total days passed in that month (to calculate absence)
-    year, month = map(int, month_str.split('-'))
-    _, num_days_in_month = calendar.monthrange(year, month)
-    
-    # If viewing current month, only count up to today
-    now = datetime.now()
-    if now.year == year and now.month == month:
-        total_working_days = now.day
-    else:
-        total_working_days = num_days_in_month
-
-    # 2. Get all users
-    cursor.execute('SELECT id, name FROM users')
-    users = cursor.fetchall()
-    
-    report_data = []
-    
-    for user in users:
-        # Count distinct days attended in this specific month
-        cursor.execute('''
-            SELECT COUNT(DISTINCT date(timestamp)) 
-            FROM attendance 
-            WHERE user_id = ? AND strftime('%Y-%m', timestamp) = ?
-        ''', (user['id'], month_str))
-        
-        days_present = cursor.fetchone()[0]
-        days_absent = total_working_days - days_present
-        
-        # Prevent negative absence numbers (just in case)
-        if days_absent < 0: days_absent = 0
-        
-        report_data.append({
-            "name": user['name'],
-            "present": days_present,
-            "absent": days_absent,
-            "total": total_working_days
-        })
-        
+    cursor.execute('''
+        SELECT user_id, MIN(start_time) AS first_in, MAX(end_time) AS last_out, SUM(marks) AS marks
+        FROM attendance_all
+        WHERE start_time >= ? AND start_time < ?
+        GROUP BY user_id, substr(start_time, 1, 10)
+        ORDER BY user_id, first_in
+    ''', (date_from, date_to))
+    rows = cursor.fetchall()
     conn.close()
-    return report_data
\ No newline at end of file
+    return rows
+
+def get_detailed_monthly_report_data(month_str):
+    """
+    Name, Days Present, Days Absent per employee for 'YYYY-MM'.
+    Kept for existing callers; the numbers come from modules.work_report.
+    """
+    from modules import work_report
+    return [{
+        "name": row["name"],
+        "present": row["present"],
+        "absent": row["absent"],
+        "total": row["working_days"],
+    } for row in work_report.monthly_report(month_str)["employees"]]
@@ -0,0 +1,324 @@
+"""
+Background enrollment jobs.
+Each enrollment (live camera, uploaded video or uploaded photos) is a job
+with an id, a status and a progress count. Jobs run on background threads
+and the web requests only read their state, so the pages and the
+/training_feed preview never block, and several people can enroll at once.
+
+- Camera jobs run one at a time (there is one webcam) on their own thread.
+- Video/photo jobs run concurrently; the face detection and encoding goes to
+  a process pool, so dlib does not hold the web server's GIL.
+The job saves the employee itself when it has its samples.
+"""
+import os
+import time
+import uuid
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from modules import db_manager
+from modules import gallery
+from modules import tracing
+
+ENROLLMENT_PROCESSES = 2    # عمليات الترميز للفيديو والصور المرفوعة
+FILE_JOB_THREADS = 4        # عدد مهام الملفات التي تعمل معاً
+MAX_SAMPLES = 20
+CAMERA_TIMEOUT = 120        # ثانية، تفشل المهمة إذا لم تكتمل العينات
+VIDEO_SAMPLE_FPS = 2        # عدد الإطارات المأخوذة من كل ثانية فيديو
+MAX_FRAME_SIDE = 1024
+JOB_HISTORY = 50            # المهام المنتهية المحفوظة لعرض حالتها
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'uploads')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+MAX_UPLOAD_MB = 200         # حد حجم الطلب كاملاً (فيديو قصير أو صور)
+MAX_UPLOAD_PHOTOS = 40
+
+FINISHED = ('done', 'failed', 'cancelled')
+
+
+class EnrollmentJob:
+    def __init__(self, name, source, paths=(), max_samples=MAX_SAMPLES, upload_dir=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.source = source            # 'camera', 'video' or 'photos'
+        self.paths = list(paths)
+        self.upload_dir = upload_dir
+        self.max_samples = max_samples
+        self.status = 'queued'
+        self.message = 'Waiting for a worker...'
+        self.samples = 0
+        self.processed = 0
+        self.total = len(self.paths) if source == 'photos' else None
+        self.skipped = 0
+        self.user_id = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.viewers = 0
+        self._cancel = threading.Event()
+        self._preview = None
+        self._preview_seq = 0
+        self._preview_changed = threading.Condition()
+
+    @property
+    def is_finished(self):
+        return self.status in FINISHED
+
+    def to_dict(self):
+        return {
+            "id": self.id, "name": self.name, "source": self.source, "status": self.status,
+            "message": self.message, "samples": self.samples, "max_samples": self.max_samples,
+            "processed": self.processed, "total": self.total, "skipped": self.skipped,
+            "user_id": self.user_id, "created": self.created, "started": self.started, "finished": self.finished,
+        }
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _set(self, status, message):
+        self.status = status
+        self.message = message
+        if status in FINISHED:
+            self.finished = time.time()
+            self._publish(None)
+
+    def _publish(self, jpeg):
+        with self._preview_changed:
+            if jpeg is not None:
+                self._preview = jpeg
+            self._preview_seq += 1
+            self._preview_changed.notify_all()
+
+    def frames(self, stop=None):
+        """Preview JPEGs until the job ends (for /training_feed). Only camera jobs have a preview."""
+        with self._preview_changed:
+            self.viewers += 1
+        seen = 0
+        try:
+            while not (stop is not None and stop.is_set()):
+                with self._preview_changed:
+                    self._preview_changed.wait_for(lambda: self._preview_seq != seen, timeout=1)
+                    seq, jpeg = self._preview_seq, self._preview
+                if seq != seen and jpeg is not None:
+                    seen = seq
+                    yield jpeg
+                if self.is_finished:
+                    return
+        finally:
+            with self._preview_changed:
+                self.viewers -= 1
+
+
+class EnrollmentQueue:
+    def __init__(self, processes=ENROLLMENT_PROCESSES, file_threads=FILE_JOB_THREADS):
+        self.processes = processes
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._camera = ThreadPoolExecutor(max_workers=1, thread_name_prefix='enroll-camera')
+        self._files = ThreadPoolExecutor(max_workers=file_threads, thread_name_prefix='enroll-files')
+        self._encoders = None
+
+    # --- public API ---
+    def submit_camera(self, name, max_samples=MAX_SAMPLES):
+        return self._submit(EnrollmentJob(name, 'camera', max_samples=max_samples), self._camera, self._run_camera)
+
+    def submit_files(self, name, paths, upload_dir=None, max_samples=MAX_SAMPLES):
+        """paths: one video file, or photos. upload_dir is removed when the job ends."""
+        videos = [p for p in paths if p.lower().endswith(VIDEO_EXTENSIONS)]
+        source = 'video' if videos else 'photos'
+        job = EnrollmentJob(name, source, videos[:1] if videos else paths, max_samples, upload_dir)
+        return self._submit(job, self._files, self._run_files)
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        return [job.to_dict() for job in reversed(list(self.jobs.values()))]
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.is_finished:
+            return False
+        job.cancel()
+        if job.status == 'queued':
+            job._set('cancelled', 'Cancelled')
+        return True
+
+    # --- internals ---
+    def _submit(self, job, executor, run):
+        with self._lock:
+            self.jobs[job.id] = job
+            finished = [j.id for j in self.jobs.values() if j.is_finished]
+            for old_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+                del self.jobs[old_id]
+        executor.submit(self._run, job, run)
+        return job
+
+    def _run(self, job, run):
+        try:
+            if job.is_finished:     # cancelled while queued
+                return
+            job.started = time.time()
+            job._set('running', 'Starting...')
+            with tracing.span("enrollment", cat="enrollment", source=job.source):
+                encodings = run(job)
+            if job._cancel.is_set():
+                job._set('cancelled', 'Cancelled')
+            elif not encodings:
+                job._set('failed', job.message if job.status == 'failed' else 'No usable face was found')
+            else:
+                self._save(job, encodings)
+        except Exception as e:
+            print(f"[ERROR] Enrollment {job.id} failed: {e}")
+            job._set('failed', f"Error: {e}")
+        finally:
+            if job.upload_dir:
+                shutil.rmtree(job.upload_dir, ignore_errors=True)
+
+    def _save(self, job, encodings):
+        job._set('saving', f"Saving {len(encodings)} samples...")
+        user_id = db_manager.add_user_with_encodings(job.name, encodings)
+        if user_id is None:
+            job._set('failed', 'Could not save to the database')
+            return
+        gallery.notify_user_added(user_id, job.name, encodings)
+        job.user_id = user_id
+        job._set('done', f"Enrolled with {len(encodings)} samples")
+
+    def _run_camera(self, job):
+        from modules import recognition
+        camera = recognition.load().RegistrationCamera(job.name)
+        camera.max_samples = job.max_samples
+        try:
+            if not camera.video.isOpened():
+                job._set('failed', 'Camera is not available')
+                return []
+            job.message = 'Please look at the camera'
+            deadline = time.time() + CAMERA_TIMEOUT
+            while not camera.is_finished:
+                if job._cancel.is_set():
+                    return []
+                if time.time() > deadline:
+                    job._set('failed', f"Timed out after {CAMERA_TIMEOUT}s with {job.samples} samples")
+                    return []
+                # Encode the preview only while someone is watching it
+                if job.viewers and not camera.encoder.has_subscribers():
+                    camera.encoder.add_subscriber()
+                elif not job.viewers and camera.encoder.has_subscribers():
+                    camera.encoder.remove_subscriber()
+                jpeg = camera.get_frame()
+                job.samples = len(camera.encodings)
+                if jpeg:
+                    job._publish(jpeg)
+            return camera.encodings
+        finally:
+            camera.release()
+
+    def _encoder_pool(self):
+        with self._lock:
+            if self._encoders is None:
+                self._encoders = ProcessPoolExecutor(max_workers=self.processes)
+            return self._encoders
+
+    def _inputs(self, job):
+        """RGB arrays to encode: every photo, or VIDEO_SAMPLE_FPS frames per second of the video."""
+        import cv2      # loaded on first job, not on `import app`
+        if job.source == 'photos':
+            for path in job.paths:
+                image = cv2.imread(path)
+                if image is None:
+                    job.skipped += 1
+                    job.processed += 1
+                    continue
+                yield image
+            return
+
+        video = cv2.VideoCapture(job.paths[0])
+        try:
+            fps = video.get(cv2.CAP_PROP_FPS) or 25
+            frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+            step = max(1, int(round(fps / VIDEO_SAMPLE_FPS)))
+            job.total = frame_count // step if frame_count > 0 else None
+            index = 0
+            while video.grab():
+                if index % step == 0:
+                    ok, image = video.retrieve()
+                    if ok:
+                        yield image
+                index += 1
+        finally:
+            video.release()
+
+    def _run_files(self, job):
+        import cv2
+        pool = self._encoder_pool()
+        from modules.face_encoder import encode_frame
+        encodings = []
+        pending = set()
+        job.message = 'Analyzing faces...'
+        inputs = self._inputs(job)
+        exhausted = False
+        while not job._cancel.is_set() and len(encodings) < job.max_samples:
+            # Keep a couple of frames per process in flight; a long video is never read into memory at once
+            while not exhausted and len(pending) < self.processes * 2:
+                image = next(inputs, None)
+                if image is None:
+                    exhausted = True
+                    break
+                height, width = image.shape[:2]
+                scale = min(1.0, MAX_FRAME_SIDE / max(height, width))
+                if scale < 1:
+                    image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+                pending.add(pool.submit(encode_frame, cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+            if not pending:
+                break
+            done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                job.processed += 1
+                encoding, status = future.result()
+                if status == 'ok':
+                    encodings.append(encoding)
+                else:
+                    job.skipped += 1
+            job.samples = min(len(encodings), job.max_samples)
+            job.message = f"Analyzed {job.processed} {'photos' if job.source == 'photos' else 'frames'}"
+        for future in pending:
+            future.cancel()
+        inputs.close()
+        return encodings[:job.max_samples]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_queue():
+    """The process-wide enrollment queue (created on first use)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = EnrollmentQueue()
+        return _queue
+
+
+def check_uploads(filenames):
+    """None if the uploads are one video or up to MAX_UPLOAD_PHOTOS photos, else the reason."""
+    extensions = [os.path.splitext(name)[1].lower() for name in filenames]
+    unsupported = [name for name, ext in zip(filenames, extensions) if ext not in IMAGE_EXTENSIONS + VIDEO_EXTENSIONS]
+    if unsupported:
+        return f"Unsupported file type: {unsupported[0]}"
+    videos = sum(1 for ext in extensions if ext in VIDEO_EXTENSIONS)
+    if videos and len(filenames) > 1:
+        return "Upload a single video, or photos only"
+    if len(filenames) > MAX_UPLOAD_PHOTOS:
+        return f"At most {MAX_UPLOAD_PHOTOS} photos per employee"
+    return None
+
+
+def new_upload_dir():
+    """A fresh folder for one job's uploaded files."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, uuid.uuid4().hex[:12])
+    os.makedirs(path)
+    return path
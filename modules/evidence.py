@@ -0,0 +1,155 @@
+"""
+Attendance evidence: a face crop and a small context image per attendance row,
+written by a background thread so the recognition loop never waits on disk.
+Files are sharded by date: attendance_evidence/YYYY/MM/DD/<attendance_id>_<user_id>_face.jpg
+"""
+import os
+import time
+import queue
+import shutil
+import threading
+from datetime import datetime, timedelta
+import cv2
+from modules import db_manager
+from modules.face_crops import crop_bounds
+
+EVIDENCE_DIR = os.path.join(db_manager.BASE_DIR, 'attendance_evidence')
+FACE_MARGIN = 0.25          # هامش حول الوجه في الصورة المقصوصة
+FACE_JPEG_QUALITY = 90
+CONTEXT_WIDTH = 480
+CONTEXT_JPEG_QUALITY = 60
+QUEUE_SIZE = 32             # إذا امتلأ الطابور نتجاهل الصورة بدل إيقاف التعرف
+MAX_AGE_DAYS = 90
+MAX_TOTAL_MB = 2048
+RETENTION_INTERVAL = 3600   # ثواني بين كل فحص للمساحة
+
+
+def crop_face(frame, box, margin=FACE_MARGIN):
+    """BGR crop; box is (top, right, bottom, left) in full-frame coordinates."""
+    y0, y1, x0, x1 = crop_bounds(box, frame.shape, margin)
+    return frame[y0:y1, x0:x1]
+
+
+class EvidenceWriter:
+    def __init__(self, base_dir=EVIDENCE_DIR, max_age_days=MAX_AGE_DAYS, max_total_mb=MAX_TOTAL_MB):
+        self.base_dir = base_dir
+        self.max_age_days = max_age_days
+        self.max_total_bytes = max_total_mb * 1024 * 1024
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = 0
+        self._last_retention = 0
+        self._thread = threading.Thread(target=self._run, name="evidence-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, box, attendance_id, user_id):
+        """Queues a snapshot. The frame is copied, so the caller may keep drawing on it."""
+        if attendance_id is None:
+            return False
+        try:
+            self.queue.put_nowait((frame.copy(), box, attendance_id, user_id, datetime.now()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=60)
+            except queue.Empty:
+                item = None
+            if item == 'stop':
+                break
+            if item is not None:
+                try:
+                    self._write(*item)
+                except Exception as e:
+                    print(f"[ERROR] Evidence write failed: {e}")
+            if time.time() - self._last_retention > RETENTION_INTERVAL:
+                self._last_retention = time.time()
+                self.enforce_retention()
+
+    def _write(self, frame, box, attendance_id, user_id, when):
+        day_dir = os.path.join(when.strftime('%Y'), when.strftime('%m'), when.strftime('%d'))
+        os.makedirs(os.path.join(self.base_dir, day_dir), exist_ok=True)
+
+        face_path = os.path.join(day_dir, f"{attendance_id}_{user_id}_face.jpg")
+        context_path = os.path.join(day_dir, f"{attendance_id}_{user_id}_context.jpg")
+
+        face = crop_face(frame, box)
+        if face.size:
+            cv2.imwrite(os.path.join(self.base_dir, face_path), face, [cv2.IMWRITE_JPEG_QUALITY, FACE_JPEG_QUALITY])
+
+        scale = CONTEXT_WIDTH / frame.shape[1]
+        context = cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else frame
+        cv2.imwrite(os.path.join(self.base_dir, context_path), context, [cv2.IMWRITE_JPEG_QUALITY, CONTEXT_JPEG_QUALITY])
+
+        db_manager.add_evidence(attendance_id, face_path, context_path)
+
+    def _day_dirs(self):
+        """[(date, path)] of every YYYY/MM/DD folder, oldest first."""
+        days = []
+        if not os.path.isdir(self.base_dir):
+            return days
+        for year in sorted(os.listdir(self.base_dir)):
+            year_dir = os.path.join(self.base_dir, year)
+            if not (year.isdigit() and os.path.isdir(year_dir)):
+                continue
+            for month in sorted(os.listdir(year_dir)):
+                month_dir = os.path.join(year_dir, month)
+                if not os.path.isdir(month_dir):
+                    continue
+                for day in sorted(os.listdir(month_dir)):
+                    try:
+                        days.append((datetime(int(year), int(month), int(day)), os.path.join(month_dir, day)))
+                    except ValueError:
+                        continue
+        return days
+
+    def _remove_day(self, path):
+        relative = os.path.relpath(path, self.base_dir)
+        removed = [os.path.join(relative, name) for name in os.listdir(path)]
+        shutil.rmtree(path, ignore_errors=True)
+        # Drop the month/year folders once they are empty
+        for parent in (os.path.dirname(path), os.path.dirname(os.path.dirname(path))):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+        db_manager.delete_evidence_files(removed)
+
+    def enforce_retention(self):
+        """Deletes whole days older than max_age_days, then oldest days until under the size limit."""
+        cutoff = datetime.now() - timedelta(days=self.max_age_days)
+        days = self._day_dirs()
+        for day, path in [d for d in days if d[0] < cutoff]:
+            self._remove_day(path)
+        days = [d for d in days if d[0] >= cutoff]
+
+        sizes = []
+        for _, path in days:
+            sizes.append(sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file()))
+        total = sum(sizes)
+        # The newest day is always kept
+        for (day, path), size in zip(days[:-1], sizes[:-1]):
+            if total <= self.max_total_bytes:
+                break
+            self._remove_day(path)
+            total -= size
+
+    def close(self, timeout=10):
+        """Writes everything still queued, then stops the thread."""
+        self.queue.put('stop')
+        self._thread.join(timeout)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """Shared writer for every camera in the process."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = EvidenceWriter()
+        return _writer
@@ -0,0 +1,69 @@
+"""
+Encodings and landmarks from the full-resolution frame.
+Detection stays on the downscaled frame; each detected box is scaled back
+up, cropped from the original BGR frame with a small margin and only that
+crop is converted to RGB. dlib's encoder and shape predictor cost about the
+same per face at any size, so a 4x larger face is nearly free and gives
+steadier match distances and eye landmarks.
+Landmarks are returned in full-frame coordinates.
+"""
+import cv2
+import face_recognition
+
+CROP_MARGIN = 0.25      # هامش حول الوجه في القص (نسبة من حجم الصندوق)
+
+
+def full_resolution_boxes(locations, scale, frame_shape):
+    """(top, right, bottom, left) boxes from the small frame, in full-frame coordinates."""
+    height, width = frame_shape[:2]
+    boxes = []
+    for top, right, bottom, left in locations:
+        boxes.append((max(0, int(top * scale)), min(width, int(right * scale)),
+                      min(height, int(bottom * scale)), max(0, int(left * scale))))
+    return boxes
+
+
+def crop_bounds(box, frame_shape, margin=CROP_MARGIN):
+    """(y0, y1, x0, x1) of a (top, right, bottom, left) box grown by margin, clamped to the frame."""
+    top, right, bottom, left = box
+    height, width = frame_shape[:2]
+    pad_y = int((bottom - top) * margin)
+    pad_x = int((right - left) * margin)
+    return max(0, top - pad_y), min(height, bottom + pad_y), max(0, left - pad_x), min(width, right + pad_x)
+
+
+def crop_face(frame, box, margin=CROP_MARGIN):
+    """RGB crop around a full-frame box. Returns (rgb_crop, box inside the crop, (y, x) offset)."""
+    top, right, bottom, left = box
+    y0, y1, x0, x1 = crop_bounds(box, frame.shape, margin)
+    rgb = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2RGB)
+    return rgb, (top - y0, right - x0, bottom - y0, left - x0), (y0, x0)
+
+
+def _shift_landmarks(landmarks, offset):
+    y0, x0 = offset
+    return {part: [(x + x0, y + y0) for x, y in points] for part, points in landmarks.items()}
+
+
+def encode_faces(frame, locations, scale=4, landmarks=True, num_jitters=1):
+    """
+    frame: original BGR frame; locations: boxes found on the frame downscaled by 1/scale.
+    Returns (encodings, landmarks_list), aligned with locations.
+    """
+    encodings = []
+    landmarks_list = []
+    for box in full_resolution_boxes(locations, scale, frame.shape):
+        rgb, inner, offset = crop_face(frame, box)
+        encodings.append(face_recognition.face_encodings(rgb, [inner], num_jitters=num_jitters)[0])
+        if landmarks:
+            landmarks_list.append(_shift_landmarks(face_recognition.face_landmarks(rgb, [inner])[0], offset))
+    return encodings, landmarks_list
+
+
+def face_landmarks(frame, locations, scale=4):
+    """Landmark-only pass (for blink tracking between recognition frames)."""
+    landmarks_list = []
+    for box in full_resolution_boxes(locations, scale, frame.shape):
+        rgb, inner, offset = crop_face(frame, box)
+        landmarks_list.append(_shift_landmarks(face_recognition.face_landmarks(rgb, [inner])[0], offset))
+    return landmarks_list
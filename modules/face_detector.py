@@ -0,0 +1,149 @@
+"""
+Cascaded face detection for the recognition frames.
+A cheap OpenCV detector looks at the frame first; dlib's HOG detector
+(face_recognition.face_locations) only runs on the regions it flagged, and
+not at all when the frame is empty. Boxes are (top, right, bottom, left) in
+the coordinates of the image passed in, like face_recognition.
+
+Modes:
+  'hog'       dlib HOG on the whole frame (the original behaviour)
+  'haar+hog'  OpenCV Haar cascade prefilter, dlib HOG confirms and refines
+  'dnn+hog'   OpenCV YuNet (cv2.FaceDetectorYN) prefilter, dlib HOG confirms
+  'haar'/'dnn'  the OpenCV detector alone (fastest, boxes are not dlib's)
+
+The YuNet model is not shipped; the dnn modes refuse to start without it.
+Download it once (about 230 KB) from the OpenCV model zoo:
+  mkdir -p models
+  curl -L -o models/face_detection_yunet_2023mar.onnx YUNET_MODEL_URL
+"""
+import os
+import cv2
+import numpy as np
+import face_recognition
+
+DETECTOR = 'haar+hog'
+PREFILTER_WIDTH = 320       # عرض الصورة التي يعمل عليها الكاشف السريع
+ROI_MARGIN = 0.5            # هامش حول المنطقة المرشحة قبل تمريرها لـ HOG
+FULL_FRAME_RATIO = 0.6      # إذا غطت المناطق أكثر من هذا من الصورة نشغل HOG على الصورة كاملة
+HAAR_PATH = os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml') if hasattr(cv2, 'data') else ''
+YUNET_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'models', 'face_detection_yunet_2023mar.onnx')
+YUNET_MODEL_URL = ('https://github.com/opencv/opencv_zoo/raw/main/models/face_detection_yunet/'
+                   'face_detection_yunet_2023mar.onnx')
+DETECTORS = ('hog', 'haar+hog', 'dnn+hog', 'haar', 'dnn')
+
+
+def _overlap(a, b):
+    """Intersection over the smaller box, for (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    if bottom <= top or right <= left:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[1] - a[3]), (b[2] - b[0]) * (b[1] - b[3]))
+    return (bottom - top) * (right - left) / max(smaller, 1)
+
+
+def _merge(regions):
+    """Unions overlapping regions so no pixel goes through HOG twice."""
+    merged = []
+    for region in regions:
+        region = list(region)
+        changed = True
+        while changed:
+            changed = False
+            for other in merged:
+                if _overlap(region, other) > 0:
+                    merged.remove(other)
+                    region = [min(region[0], other[0]), max(region[1], other[1]),
+                              max(region[2], other[2]), min(region[3], other[3])]
+                    changed = True
+                    break
+        merged.append(region)
+    return [tuple(r) for r in merged]
+
+
+class FaceDetector:
+    def __init__(self, mode=DETECTOR, prefilter_width=PREFILTER_WIDTH, roi_margin=ROI_MARGIN):
+        if mode not in DETECTORS:
+            raise ValueError(f"unknown detector '{mode}', expected one of {DETECTORS}")
+        self.prefilter_width = prefilter_width
+        self.roi_margin = roi_margin
+        self._haar = None
+        self._yunet = None
+
+        if mode.startswith('haar'):
+            self._haar = cv2.CascadeClassifier(HAAR_PATH) if os.path.exists(HAAR_PATH) else None
+            if self._haar is None or self._haar.empty():
+                print(f"[WARN] Haar cascade not found ({HAAR_PATH}), falling back to HOG only")
+                mode = 'hog'
+        elif mode.startswith('dnn'):
+            # An explicit dnn choice must not silently become the (much slower) HOG detector
+            if not hasattr(cv2, 'FaceDetectorYN'):
+                raise RuntimeError(f"detector '{mode}' needs OpenCV 4.5.4+ (cv2.FaceDetectorYN)")
+            if not os.path.exists(YUNET_MODEL_PATH):
+                raise FileNotFoundError(f"detector '{mode}' needs the YuNet model at {YUNET_MODEL_PATH}; "
+                                        f"download it from {YUNET_MODEL_URL}")
+            self._yunet = cv2.FaceDetectorYN.create(YUNET_MODEL_PATH, "", (prefilter_width, prefilter_width),
+                                                    score_threshold=0.6)
+        self.mode = mode
+
+    def candidates(self, rgb):
+        """
+        Candidate boxes from the cheap OpenCV detector, in rgb coordinates.
+        Empty for 'hog'; with a '+hog' mode, an empty result means dlib is skipped.
+        """
+        if self.mode == 'hog':
+            return []
+        height, width = rgb.shape[:2]
+        scale = min(1.0, self.prefilter_width / width)
+        small = cv2.resize(rgb, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA) if scale < 1 else rgb
+
+        if self._haar is not None:
+            gray = cv2.equalizeHist(cv2.cvtColor(small, cv2.COLOR_RGB2GRAY))
+            # Low minNeighbors: recall matters more than precision, HOG rejects the false positives
+            found = self._haar.detectMultiScale(gray, scaleFactor=1.15, minNeighbors=3, minSize=(20, 20))
+            rects = [tuple(r) for r in found] if len(found) else []
+        else:
+            self._yunet.setInputSize((small.shape[1], small.shape[0]))
+            _, found = self._yunet.detect(cv2.cvtColor(small, cv2.COLOR_RGB2BGR))
+            rects = [tuple(r[:4]) for r in found] if found is not None else []
+
+        boxes = []
+        for x, y, w, h in rects:
+            boxes.append((int(y / scale), int((x + w) / scale), int((y + h) / scale), int(x / scale)))
+        return boxes
+
+    def _expand(self, box, height, width):
+        top, right, bottom, left = box
+        pad_y = int((bottom - top) * self.roi_margin)
+        pad_x = int((right - left) * self.roi_margin)
+        return (max(0, top - pad_y), min(width, right + pad_x), min(height, bottom + pad_y), max(0, left - pad_x))
+
+    def detect(self, rgb, hints=()):
+        """
+        Face boxes in rgb. hints are boxes from the previous recognition frame;
+        they are always re-checked, so a tracked face the prefilter misses
+        (turned head, poor light) is not dropped.
+        """
+        if self.mode == 'hog':
+            return face_recognition.face_locations(rgb)
+
+        candidates = self.candidates(rgb)
+        if self.mode in ('haar', 'dnn'):
+            return candidates
+
+        height, width = rgb.shape[:2]
+        regions = _merge([self._expand(box, height, width) for box in list(candidates) + list(hints)])
+        if not regions:
+            return []
+        area = sum((r[2] - r[0]) * (r[1] - r[3]) for r in regions)
+        if area > FULL_FRAME_RATIO * height * width:
+            return face_recognition.face_locations(rgb)
+
+        faces = []
+        for top, right, bottom, left in regions:
+            roi = np.ascontiguousarray(rgb[top:bottom, left:right])
+            for t, r, b, l in face_recognition.face_locations(roi):
+                box = (t + top, r + left, b + top, l + left)
+                faces.append(box)
+        return faces
@@ -1,6 +1,10 @@
 import face_recognition
 import pickle
 import os
+from PIL import Image
+import numpy as np
+
+MAX_IMAGE_SIDE = 1024   # صور الموارد البشرية كبيرة، نصغرها قبل الكشف
 
 def get_face_encoding(image_path):
     
@@ -30,6 +34,35 @@ def get_face_encoding(image_path):
         print(f"❌ An unexpected error occurred: {e}")
         return None
 
+def encode_frame(image):
+    """
+    (encoding, status) for one RGB array, with the same statuses as
+    encode_single_face. Picklable, so it also runs inside a process pool.
+    """
+    face_locations = face_recognition.face_locations(image)
+    if len(face_locations) == 0:
+        return None, 'no_face'
+    if len(face_locations) > 1:
+        return None, 'multiple_faces'
+    return face_recognition.face_encodings(image, face_locations)[0], 'ok'
+
+def encode_single_face(image_path, max_side=MAX_IMAGE_SIDE):
+    """
+    Quiet version for bulk import (runs inside a process pool).
+    Returns (image_path, encoding, status) where status is 'ok', 'no_face',
+    'multiple_faces' or 'error: ...'; encoding is None unless status is 'ok'.
+    """
+    try:
+        with Image.open(image_path) as img:
+            img = img.convert('RGB')
+            img.thumbnail((max_side, max_side))
+            image = np.array(img)
+
+        encoding, status = encode_frame(image)
+        return image_path, encoding, status
+    except Exception as e:
+        return image_path, None, f'error: {e}'
+
 if __name__ == "__main__":
 
     test_image_path = "../me.jpg" 
@@ -0,0 +1,175 @@
+"""
+Local channel between the recognition worker and the web app.
+The worker publishes annotated JPEG frames and recognition events; the web
+app connects as a reader. Uses multiprocessing.connection over localhost,
+so it works the same on Windows and Linux.
+Messages are raw bytes (frames) or JSON (subscription kind, events); nothing
+is unpickled. The auth key is per install: ATTENDANCE_BUS_KEY, or a random
+key generated once in database/.frame_bus_key (readable by the owner only).
+"""
+import os
+import json
+import socket
+import secrets
+import threading
+from collections import deque
+from multiprocessing.connection import Listener, Client
+
+WORKER_ADDRESS = ('127.0.0.1', 6001)
+AUTHKEY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', '.frame_bus_key')
+EVENT_BACKLOG = 100         # آخر الأحداث المحفوظة للمشتركين الجدد
+KEEPALIVE_SECONDS = 5
+LISTEN_BACKLOG = 64         # اتصالات متزامنة من صفحات كثيرة تفتح البث في نفس اللحظة
+
+
+def get_authkey(path=AUTHKEY_PATH):
+    """The shared key of this install; created on first use by whichever process starts first."""
+    env_key = os.environ.get('ATTENDANCE_BUS_KEY')
+    if env_key:
+        return env_key.encode()
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, 'rb') as f:
+            return f.read().strip()
+    key = secrets.token_hex(32).encode()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+def _send_json(conn, value):
+    conn.send_bytes(json.dumps(value).encode('utf-8'))
+
+
+def _recv_json(conn):
+    return json.loads(conn.recv_bytes().decode('utf-8'))
+
+
+class FramePublisher:
+    """
+    Worker side. Every 'frames' client always gets the newest frame (older ones
+    are dropped if it is slow); every 'events' client gets all events.
+    """
+    def __init__(self, address=WORKER_ADDRESS, authkey=None, on_subscribe=None, on_unsubscribe=None):
+        self.listener = Listener(address, authkey=authkey or get_authkey(), backlog=LISTEN_BACKLOG)
+        self.on_subscribe = on_subscribe
+        self.on_unsubscribe = on_unsubscribe
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_seq = 0
+        self._events = deque(maxlen=EVENT_BACKLOG)
+        self._event_seq = 0
+        self.frame_subscribers = 0
+        self.running = True
+
+        threading.Thread(target=self._accept_loop, name="frame-bus-accept", daemon=True).start()
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn = self.listener.accept()
+            except Exception:
+                # Bad auth key, port probe (is_worker_running) or listener closed
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            kind = _recv_json(conn)
+        except (EOFError, OSError, ValueError):
+            conn.close()
+            return
+        if kind not in ('frames', 'events'):
+            conn.close()
+            return
+
+        if kind == 'frames':
+            with self._cond:
+                self.frame_subscribers += 1
+            if self.on_subscribe:
+                self.on_subscribe()
+
+        with self._cond:
+            seen_frame = self._frame_seq
+            seen_event = self._event_seq - len(self._events) if kind == 'events' else self._event_seq
+
+        try:
+            while self.running:
+                with self._cond:
+                    if kind == 'frames':
+                        self._cond.wait_for(lambda: self._frame_seq != seen_frame or not self.running, KEEPALIVE_SECONDS)
+                        frame = self._frame if self._frame_seq != seen_frame else None
+                        seen_frame = self._frame_seq
+                    else:
+                        self._cond.wait_for(lambda: self._event_seq != seen_event or not self.running, KEEPALIVE_SECONDS)
+                        new_count = min(self._event_seq - seen_event, len(self._events))
+                        events = list(self._events)[len(self._events) - new_count:] if new_count else []
+                        seen_event = self._event_seq
+
+                # Empty bytes / None act as keepalive so dead readers are noticed
+                if kind == 'frames':
+                    conn.send_bytes(frame or b'')
+                elif events:
+                    for event in events:
+                        _send_json(conn, event)
+                else:
+                    _send_json(conn, None)
+        except (EOFError, OSError):
+            pass
+        finally:
+            if kind == 'frames':
+                with self._cond:
+                    self.frame_subscribers -= 1
+                if self.on_unsubscribe:
+                    self.on_unsubscribe()
+            conn.close()
+
+    def publish_frame(self, jpeg):
+        with self._cond:
+            self._frame = jpeg
+            self._frame_seq += 1
+            self._cond.notify_all()
+
+    def publish_event(self, event):
+        with self._cond:
+            self._events.append(event)
+            self._event_seq += 1
+            self._cond.notify_all()
+
+    def close(self):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        self.listener.close()
+
+
+class FrameSubscriber:
+    """Web app side: a connection to the worker for 'frames' or 'events'."""
+    def __init__(self, kind, address=WORKER_ADDRESS, authkey=None):
+        self.kind = kind
+        self.conn = Client(address, authkey=authkey or get_authkey())
+        _send_json(self.conn, kind)
+
+    def frames(self):
+        while True:
+            data = self.conn.recv_bytes()
+            if data:
+                yield data
+
+    def events(self):
+        """Yields event dicts, and None for keepalives."""
+        while True:
+            yield _recv_json(self.conn)
+
+    def close(self):
+        self.conn.close()
+
+
+def is_worker_running(address=WORKER_ADDRESS, timeout=0.2):
+    try:
+        with socket.create_connection(address, timeout=timeout):
+            return True
+    except OSError:
+        return False
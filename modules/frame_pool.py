@@ -0,0 +1,69 @@
+"""
+Preallocated buffers for the per-frame pipeline.
+Every stage writes into a named buffer that is created once per frame size
+(OpenCV dst= outputs), so a camera running at 30 fps does not allocate a
+new 1080p array for each capture, resize and colour conversion.
+Buffers are overwritten on the next frame: copy anything that must outlive it.
+"""
+import time
+import cv2
+import numpy as np
+
+READ_RETRY_SECONDS = (0.05, 1.0)    # انتظار متزايد بعد فشل قراءة الكاميرا (أقل، أقصى)
+
+
+class FramePool:
+    def __init__(self):
+        self._buffers = {}
+        self._retry = READ_RETRY_SECONDS[0]
+
+    def get(self, name, shape, dtype=np.uint8):
+        """The buffer called `name`, reallocated only when the shape or dtype changes."""
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        return buf
+
+    def read(self, video):
+        """
+        VideoCapture.read() into the same frame buffer every time.
+        A failed read (camera unplugged or busy) fails instantly, so it then
+        sleeps, doubling up to READ_RETRY_SECONDS[1], and the camera loops
+        back off instead of spinning a core.
+        """
+        frame = self._buffers.get('frame')
+        success, frame = video.read(frame) if frame is not None else video.read()
+        if success:
+            self._buffers['frame'] = frame
+            self._retry = READ_RETRY_SECONDS[0]
+        else:
+            time.sleep(self._retry)
+            self._retry = min(self._retry * 2, READ_RETRY_SECONDS[1])
+        return success, frame
+
+    def resize(self, name, src, fx=None, fy=None, size=None, interpolation=cv2.INTER_LINEAR):
+        """cv2.resize into a pooled buffer. size=(width, height) or fx/fy like cv2.resize."""
+        if size is None:
+            height, width = src.shape[:2]
+            size = (int(round(width * fx)), int(round(height * (fy or fx))))
+        dst = self.get(name, (size[1], size[0]) + src.shape[2:], src.dtype)
+        return cv2.resize(src, size, dst=dst, interpolation=interpolation)
+
+    def convert(self, name, src, code, channels=3):
+        """cv2.cvtColor into a pooled buffer (channels = channels of the result)."""
+        shape = src.shape[:2] + ((channels,) if channels > 1 else ())
+        return cv2.cvtColor(src, code, dst=self.get(name, shape, src.dtype))
+
+    def to_rgb(self, name, src):
+        return self.convert(name, src, cv2.COLOR_BGR2RGB)
+
+    def strided(self, name, src, step):
+        """Contiguous copy of src[::step, ::step] without a temporary array."""
+        view = src[::step, ::step]
+        dst = self.get(name, view.shape, src.dtype)
+        np.copyto(dst, view)
+        return dst
+
+    def nbytes(self):
+        return sum(buf.nbytes for buf in self._buffers.values())
@@ -0,0 +1,136 @@
+import time
+import threading
+import weakref
+import numpy as np
+from modules import db_manager
+from modules.ann_index import IVFIndex
+from modules.quantization import Int8Matcher, make_matcher
+
+TOLERANCE = 0.5
+ANN_MIN_GALLERY_SIZE = 5000     # استخدام الفهرس التقريبي فقط للمعارض الكبيرة
+ANN_NPROBE = 8
+ANN_USE_PQ = False
+SHARED_REFRESH_SECONDS = 5      # كل كم ثانية نتحقق من رقم نسخة المعرض
+
+# All galleries currently in use, so a new enrollment reaches running cameras
+_live_galleries = weakref.WeakSet()
+
+
+class Gallery:
+    """
+    The enrolled faces (one row per stored sample), loaded from the DB snapshot.
+    Large galleries are searched through an IVF index instead of brute force.
+    precision only applies to an explicit users list; the snapshot is stored in
+    db_manager.SNAPSHOT_PRECISION.
+    """
+    def __init__(self, users=None, use_index=None, precision='float64'):
+        if users is None:
+            # Memory-mapped snapshot: shared page cache, no unpickling on startup
+            snapshot = db_manager.load_gallery_snapshot()
+            self.version = snapshot["version"]
+            self.ids = snapshot["ids"]
+            self.names = snapshot["names"]
+            precision = snapshot.get("precision", "float64")
+            if precision == 'int8':
+                self.matcher = Int8Matcher(snapshot["encodings"], snapshot["offset"], snapshot["scale"])
+            else:
+                self.matcher = make_matcher(snapshot["encodings"], precision)
+        else:
+            self.version = None
+            self.ids = [user["id"] for user in users]
+            self.names = [user["name"] for user in users]
+            if users:
+                encodings = np.array([user["encoding"] for user in users], dtype=np.float64)
+            else:
+                encodings = np.empty((0, 128), dtype=np.float64)
+            self.matcher = make_matcher(encodings, precision)
+
+        if use_index is None:
+            use_index = len(self.ids) >= ANN_MIN_GALLERY_SIZE
+        self.index = None
+        if use_index and len(self.ids):
+            # The float copy only lives while training; searches read the matcher's own rows
+            self.index = IVFIndex(nprobe=ANN_NPROBE, use_pq=ANN_USE_PQ).build(self.matcher.to_float(), source=self.matcher)
+
+        _live_galleries.add(self)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, user_id, name, encodings):
+        encodings = np.asarray(encodings, dtype=np.float64).reshape(-1, 128)
+        self.ids.extend([user_id] * len(encodings))
+        self.names.extend([name] * len(encodings))
+        self.matcher.add(encodings)
+        if self.index is not None:
+            self.index.add(encodings)
+
+    def nearest(self, face_encoding):
+        """Returns (row, distance) of the closest stored sample, or (None, None)."""
+        if len(self.ids) == 0:
+            return None, None
+        if self.index is not None:
+            rows, distances = self.index.search(face_encoding, k=1)
+            if len(rows):
+                return int(rows[0]), float(distances[0])
+        distances = self.matcher.distances(face_encoding)
+        row = int(np.argmin(distances))
+        return row, float(distances[row])
+
+    def match(self, face_encoding, tolerance=TOLERANCE):
+        """Returns (user_id, name, distance); user_id/name are None when no one is close enough."""
+        row, distance = self.nearest(face_encoding)
+        if row is None or distance > tolerance:
+            return None, None, distance
+        return self.ids[row], self.names[row], distance
+
+    def match_batch(self, face_encodings, tolerance=TOLERANCE):
+        """Matches many encodings in one vectorized pass. Returns a list of (user_id, name, distance)."""
+        face_encodings = np.asarray(face_encodings, dtype=np.float64).reshape(-1, 128)
+        if len(self.ids) == 0:
+            return [(None, None, None)] * len(face_encodings)
+        if self.index is not None:
+            rows, distances = self.index.nearest_batch(face_encodings)
+            missing = rows < 0
+            if missing.any():
+                # Same fallback as nearest(): brute force when the probed lists were empty
+                rows[missing], distances[missing] = self.matcher.nearest_batch(face_encodings[missing])
+        else:
+            rows, distances = self.matcher.nearest_batch(face_encodings)
+
+        results = []
+        for row, distance in zip(rows, distances):
+            distance = float(distance)
+            if distance > tolerance:
+                results.append((None, None, distance))
+            else:
+                results.append((self.ids[row], self.names[row], distance))
+        return results
+
+
+_shared = None
+_shared_checked = 0
+_shared_lock = threading.Lock()
+
+def get_shared_gallery():
+    """
+    One gallery per process for request handlers (e.g. /api/identify).
+    Reloaded from the snapshot when the DB gallery version moves on.
+    """
+    global _shared, _shared_checked
+    with _shared_lock:
+        now = time.time()
+        if _shared is None:
+            _shared = Gallery()
+            _shared_checked = now
+        elif now - _shared_checked > SHARED_REFRESH_SECONDS:
+            _shared_checked = now
+            if db_manager.get_gallery_version() != _shared.version:
+                _shared = Gallery()
+        return _shared
+
+
+def notify_user_added(user_id, name, encodings):
+    """Inserts a newly enrolled user into every gallery that is in use."""
+    for gallery in list(_live_galleries):
+        gallery.add(user_id, name, encodings)
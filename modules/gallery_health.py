@@ -0,0 +1,122 @@
+"""
+Gallery health analysis: finds employees whose encodings are dangerously
+close to each other (possible misattribution, or the same person enrolled
+twice) and samples that do not look like the rest of their owner's samples.
+All-pairs distances are computed block by block, so memory stays bounded.
+"""
+import numpy as np
+
+BLOCK_SIZE = 2048
+COLLISION_DISTANCE = 0.5    # = tolerance المطابقة: أقل من هذا قد يُخلط بين موظفين
+DUPLICATE_DISTANCE = 0.35   # مراكز أقرب من هذا غالباً نفس الشخص مسجل مرتين
+OUTLIER_DISTANCE = 0.45     # عينة بعيدة عن مركز صاحبها
+
+
+def _block_squared(a, b, a_norms, b_norms):
+    return np.maximum(a_norms[:, None] - 2.0 * a @ b.T + b_norms[None, :], 0)
+
+
+def nearest_other_user(vectors, owners, block_size=BLOCK_SIZE, pair_threshold=COLLISION_DISTANCE):
+    """
+    For every sample, the nearest sample that belongs to a different user.
+    Returns (nearest_rows, nearest_distances, close_pairs) where close_pairs maps
+    (user_a, user_b) -> smallest distance below pair_threshold.
+    """
+    # float32 squared distances: half the memory traffic, sqrt only on the results
+    vectors = np.asarray(vectors, dtype=np.float32)
+    owners = np.asarray(owners)
+    norms = (vectors ** 2).sum(axis=1)
+    n = len(vectors)
+    best = np.full(n, np.inf, dtype=np.float32)
+    best_rows = np.full(n, -1, dtype=np.int64)
+    close_pairs = {}
+    threshold2 = pair_threshold ** 2
+
+    for i in range(0, n, block_size):
+        rows_i = slice(i, min(i + block_size, n))
+        # Only blocks on/after the diagonal; each result updates both sides
+        for j in range(i, n, block_size):
+            rows_j = slice(j, min(j + block_size, n))
+            d = _block_squared(vectors[rows_i], vectors[rows_j], norms[rows_i], norms[rows_j])
+            # Samples are usually grouped by user, so most blocks share no owner and need no mask
+            if np.intersect1d(owners[rows_i], owners[rows_j]).size:
+                d[owners[rows_i][:, None] == owners[rows_j][None, :]] = np.inf
+
+            col = d.argmin(axis=1)
+            values = d[np.arange(len(col)), col]
+            better = values < best[rows_i]
+            best[rows_i][better] = values[better]
+            best_rows[rows_i][better] = col[better] + j
+
+            row = d.argmin(axis=0)
+            values = d[row, np.arange(len(row))]
+            better = values < best[rows_j]
+            best[rows_j][better] = values[better]
+            best_rows[rows_j][better] = row[better] + i
+
+            for a, b in zip(*np.nonzero(d < threshold2)):
+                pair = tuple(sorted((owners[i + a].item(), owners[j + b].item())))
+                distance = float(np.sqrt(d[a, b]))
+                if distance < close_pairs.get(pair, np.inf):
+                    close_pairs[pair] = distance
+
+    return best_rows, np.sqrt(best).astype(np.float64), close_pairs
+
+
+def analyze(face_ids, owners, names, vectors, block_size=BLOCK_SIZE):
+    """
+    face_ids/owners/names/vectors are aligned per stored sample.
+    Returns a report dict: per-user spread, suspicious user pairs and outlier samples.
+    """
+    vectors = np.asarray(vectors, dtype=np.float64)
+    owners = np.asarray(owners)
+    user_ids, inverse = np.unique(owners, return_inverse=True)
+    name_of = dict(zip(owners.tolist(), names))
+
+    # Per-user centroid and spread
+    sums = np.zeros((len(user_ids), vectors.shape[1]))
+    np.add.at(sums, inverse, vectors)
+    counts = np.bincount(inverse)
+    centroids = sums / counts[:, None]
+    to_centroid = np.linalg.norm(vectors - centroids[inverse], axis=1)
+    spread_mean = np.bincount(inverse, weights=to_centroid) / counts
+    spread_max = np.zeros(len(user_ids))
+    np.maximum.at(spread_max, inverse, to_centroid)
+
+    nearest_rows, nearest, close_pairs = nearest_other_user(vectors, owners, block_size)
+
+    users = []
+    for k, user_id in enumerate(user_ids.tolist()):
+        users.append({
+            "user_id": user_id,
+            "name": name_of[user_id],
+            "samples": int(counts[k]),
+            "spread_mean": round(float(spread_mean[k]), 4),
+            "spread_max": round(float(spread_max[k]), 4),
+        })
+
+    index_of = {user_id: k for k, user_id in enumerate(user_ids.tolist())}
+    pairs = []
+    for (a, b), distance in sorted(close_pairs.items(), key=lambda item: item[1]):
+        centroid_distance = float(np.linalg.norm(centroids[index_of[a]] - centroids[index_of[b]]))
+        pairs.append({
+            "user_a": a, "name_a": name_of[a],
+            "user_b": b, "name_b": name_of[b],
+            "min_distance": round(distance, 4),
+            "centroid_distance": round(centroid_distance, 4),
+            "likely_duplicate": centroid_distance < DUPLICATE_DISTANCE,
+        })
+
+    outliers = []
+    for row in np.flatnonzero((to_centroid > OUTLIER_DISTANCE) | (nearest < to_centroid)):
+        other = nearest_rows[row]
+        outliers.append({
+            "face_id": face_ids[row],
+            "user_id": owners[row].item(),
+            "name": name_of[owners[row].item()],
+            "distance_to_own_centroid": round(float(to_centroid[row]), 4),
+            "nearest_other_user": owners[other].item() if other >= 0 else None,
+            "nearest_other_distance": round(float(nearest[row]), 4) if other >= 0 else None,
+        })
+
+    return {"samples": len(vectors), "users": users, "suspicious_pairs": pairs, "outliers": outliers}
@@ -0,0 +1,133 @@
+"""
+Gallery bundles for syncing enrolled staff between attendance nodes.
+
+File layout (little-endian):
+  magic         4 bytes  b'FGAL'
+  format        uint16   BUNDLE_FORMAT
+  reserved      uint16
+  header_len    uint32
+  header        JSON (utf-8): node_id, gallery_version, since_version, dtype,
+                users [{uid, name, version, faces}], tombstones [{uid, version}]
+  vectors       faces x 128 raw float32, in user order
+  checksum      32 bytes SHA-256 of everything above
+
+Employees are matched across nodes by users.uid (employees enrolled before
+uids existed get one derived from their row, so copies of one database
+agree). Each database file has its own node_id; a copied file re-keys itself
+on its first init_db. A full export
+(since_version None) carries every employee; a delta carries the employees
+changed and deleted after since_version on the exporting node.
+"""
+import os
+import json
+import struct
+import hashlib
+import numpy as np
+from modules import db_manager
+
+MAGIC = b'FGAL'
+BUNDLE_FORMAT = 1
+VECTOR_DTYPE = '<f4'        # float32: نصف الحجم، والفرق في المسافات أقل من 1e-6
+EMBEDDING_SIZE = 128
+_PREFIX = struct.Struct('<4sHHI')
+
+
+class BundleError(ValueError):
+    pass
+
+
+def write_bundle(path, node_id, gallery_version, since_version, users, tombstones):
+    header = {
+        "node_id": node_id,
+        "gallery_version": gallery_version,
+        "since_version": since_version,
+        "dtype": VECTOR_DTYPE,
+        "users": [{"uid": u["uid"], "name": u["name"], "version": u["version"], "faces": len(u["encodings"])}
+                  for u in users],
+        "tombstones": tombstones,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    encodings = [e for u in users for e in u["encodings"]]
+    vectors = np.asarray(encodings, dtype=VECTOR_DTYPE).reshape(-1, EMBEDDING_SIZE)
+
+    digest = hashlib.sha256()
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        for chunk in (_PREFIX.pack(MAGIC, BUNDLE_FORMAT, 0, len(header_bytes)), header_bytes, vectors.tobytes()):
+            digest.update(chunk)
+            f.write(chunk)
+        f.write(digest.digest())
+    # Readers on the shared drive never see a half-written bundle
+    os.replace(tmp_path, path)
+    return header
+
+
+def read_bundle(path):
+    """Returns (header, users with their encodings). Raises BundleError if the file is damaged."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _PREFIX.size + 32:
+        raise BundleError("file too short")
+    body, checksum = data[:-32], data[-32:]
+    if hashlib.sha256(body).digest() != checksum:
+        raise BundleError("checksum mismatch (incomplete copy?)")
+    magic, fmt, _, header_len = _PREFIX.unpack_from(body)
+    if magic != MAGIC:
+        raise BundleError("not a gallery bundle")
+    if fmt != BUNDLE_FORMAT:
+        raise BundleError(f"unsupported bundle format {fmt}")
+
+    header = json.loads(body[_PREFIX.size:_PREFIX.size + header_len].decode('utf-8'))
+    vectors = np.frombuffer(body, dtype=header["dtype"], offset=_PREFIX.size + header_len).reshape(-1, EMBEDDING_SIZE)
+    if len(vectors) != sum(u["faces"] for u in header["users"]):
+        raise BundleError("face count does not match the header")
+
+    users = []
+    start = 0
+    for user in header["users"]:
+        end = start + user["faces"]
+        users.append(dict(user, encodings=list(vectors[start:end].astype(np.float64))))
+        start = end
+    return header, users
+
+
+def export_bundle(path, since_version=None):
+    """Writes the local gallery (or the changes after since_version) to path."""
+    db_manager.init_db()
+    version, users, tombstones = db_manager.get_gallery_changes(since_version)
+    return write_bundle(path, db_manager.get_sync_value('node_id'), version, since_version, users, tombstones)
+
+
+def import_bundle(path, only_new=True):
+    """
+    Merges a bundle into the local database. With only_new, employees already
+    imported from the same source at their current version are skipped, so
+    pulling a full export from the shared drive only applies what changed.
+    Returns a summary dict, or None if the merge failed.
+    """
+    db_manager.init_db()
+    header, users = read_bundle(path)
+    source = header["node_id"]
+    if source == db_manager.get_sync_value('node_id'):
+        raise BundleError("bundle was exported by this node")
+
+    state_key = f"last_import:{source}"
+    last = db_manager.get_sync_value(state_key)
+    last = int(last) if last is not None else None
+    since = header["since_version"]
+    if only_new and since is not None and (last is None or since > last):
+        raise BundleError(f"delta starts after version {since}, but this node only has changes up to "
+                          f"{last if last is not None else 'none'} from that source; import a full export first")
+    if only_new and last is not None:
+        users = [u for u in users if u["version"] > last]
+        tombstones = [t for t in header["tombstones"] if t["version"] > last]
+    else:
+        tombstones = header["tombstones"]
+
+    counts = db_manager.apply_gallery_changes(users, tombstones)
+    if counts is None:
+        return None
+    if last is None or header["gallery_version"] > last:
+        db_manager.set_sync_value(state_key, header["gallery_version"])
+    return dict(counts, source=source, source_version=header["gallery_version"], previous_version=last,
+                skipped=len(header["users"]) - len(users))
@@ -0,0 +1,161 @@
+import time
+import numpy as np
+
+# إعدادات كشف الرمش
+EYE_ASPECT_RATIO_THRESHOLD = 0.23
+CONSECUTIVE_FRAMES = 2      # أقل عدد إطارات متتالية والعين مغلقة
+HISTORY_SIZE = 32           # حجم سجل EAR لكل وجه (ring buffer)
+MAX_TRACK_DISTANCE = 40     # بالبكسل في إحداثيات صورة الكشف
+TRACK_TIMEOUT = 2.0         # ثواني قبل حذف وجه اختفى
+BLINK_VALID_SECONDS = 3.0   # مدة صلاحية الرمشة حتى يتم استهلاكها
+
+
+def eye_points(face_landmarks_list):
+    """Stacks the eye landmarks of all faces into one (n, 2, 6, 2) array."""
+    if not face_landmarks_list:
+        return np.empty((0, 2, 6, 2), dtype=np.float64)
+    return np.array([[lm['left_eye'], lm['right_eye']] for lm in face_landmarks_list], dtype=np.float64)
+
+
+def eye_aspect_ratios(face_landmarks_list):
+    """Average EAR of both eyes for every face at once. Returns an (n,) array."""
+    eyes = eye_points(face_landmarks_list)
+    A = np.linalg.norm(eyes[..., 1, :] - eyes[..., 5, :], axis=-1)
+    B = np.linalg.norm(eyes[..., 2, :] - eyes[..., 4, :], axis=-1)
+    C = np.linalg.norm(eyes[..., 0, :] - eyes[..., 3, :], axis=-1)
+    ear = (A + B) / (2.0 * np.maximum(C, 1e-6))
+    return ear.mean(axis=-1)
+
+
+def eye_aspect_ratio(eye):
+    """EAR of a single eye (6 points), kept for the older scripts."""
+    eye = np.asarray(eye, dtype=np.float64)
+    A = np.linalg.norm(eye[1] - eye[5])
+    B = np.linalg.norm(eye[2] - eye[4])
+    C = np.linalg.norm(eye[0] - eye[3])
+    return (A + B) / (2.0 * C)
+
+
+class EarHistory:
+    """Fixed-size ring buffer of EAR samples for one face."""
+    def __init__(self, size=HISTORY_SIZE):
+        self.values = np.full(size, np.nan)
+        self.index = 0
+        self.count = 0
+
+    def push(self, value):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % len(self.values)
+        self.count = min(self.count + 1, len(self.values))
+
+    def ordered(self):
+        """Samples from oldest to newest."""
+        if self.count < len(self.values):
+            return self.values[:self.count]
+        return np.roll(self.values, -self.index)
+
+
+def detect_blink(history, threshold=EYE_ASPECT_RATIO_THRESHOLD, consecutive_frames=CONSECUTIVE_FRAMES):
+    """
+    True when the newest sample closes a blink: open -> closed (at least
+    consecutive_frames samples) -> open.
+    """
+    ears = history.ordered()
+    if len(ears) < consecutive_frames + 2:
+        return False
+    closed = ears < threshold
+    if closed[-1] or not closed[-2]:
+        return False
+
+    # Length of the closed run that ends just before the newest sample
+    before = closed[:-1][::-1]
+    open_idx = np.flatnonzero(~before)
+    if len(open_idx) == 0:
+        return False   # run starts before the history, we never saw the eye open
+    return open_idx[0] >= consecutive_frames
+
+
+class LivenessTracker:
+    """
+    Keeps an EAR history per face track and detects blinks from the time series.
+    update() only needs landmarks, so it can run on every frame while full
+    recognition runs less often.
+    """
+    def __init__(self, threshold=EYE_ASPECT_RATIO_THRESHOLD, consecutive_frames=CONSECUTIVE_FRAMES,
+                 history_size=HISTORY_SIZE, max_distance=MAX_TRACK_DISTANCE, timeout=TRACK_TIMEOUT):
+        self.threshold = threshold
+        self.consecutive_frames = consecutive_frames
+        self.history_size = history_size
+        self.max_distance = max_distance
+        self.timeout = timeout
+
+        self.tracks = {}
+        self.next_track_id = 1
+
+    def _assign(self, centers, now):
+        """Greedy nearest-centre matching of detections to existing tracks."""
+        track_ids = [None] * len(centers)
+        live_ids = list(self.tracks.keys())
+        if live_ids and len(centers):
+            track_centers = np.array([self.tracks[t]['center'] for t in live_ids])
+            distances = np.linalg.norm(centers[:, None, :] - track_centers[None, :, :], axis=-1)
+            for flat in np.argsort(distances, axis=None):
+                i, j = np.unravel_index(flat, distances.shape)
+                if distances[i, j] > self.max_distance:
+                    break
+                if track_ids[i] is None and live_ids[j] not in track_ids:
+                    track_ids[i] = live_ids[j]
+
+        for i, track_id in enumerate(track_ids):
+            if track_id is None:
+                track_id = self.next_track_id
+                self.next_track_id += 1
+                self.tracks[track_id] = {
+                    "history": EarHistory(self.history_size),
+                    "blinks": 0,
+                    "last_blink": None,
+                }
+                track_ids[i] = track_id
+            self.tracks[track_id]['center'] = centers[i]
+            self.tracks[track_id]['last_seen'] = now
+        return track_ids
+
+    def update(self, face_locations, face_landmarks_list, now=None):
+        """
+        face_locations: (top, right, bottom, left) boxes, aligned with face_landmarks_list.
+        Returns the track id of every face.
+        """
+        if now is None:
+            now = time.time()
+
+        boxes = np.array(face_locations, dtype=np.float64).reshape(-1, 4)
+        centers = np.stack([(boxes[:, 1] + boxes[:, 3]) / 2.0, (boxes[:, 0] + boxes[:, 2]) / 2.0], axis=1)
+        track_ids = self._assign(centers, now)
+
+        ears = eye_aspect_ratios(face_landmarks_list)
+        for track_id, ear in zip(track_ids, ears):
+            track = self.tracks[track_id]
+            track['ear'] = ear
+            track['history'].push(ear)
+            if detect_blink(track['history'], self.threshold, self.consecutive_frames):
+                track['blinks'] += 1
+                track['last_blink'] = now
+
+        for track_id in [t for t, track in self.tracks.items() if now - track['last_seen'] > self.timeout]:
+            del self.tracks[track_id]
+        return track_ids
+
+    def consume_blink(self, track_id, now=None):
+        """True (once) if this track blinked recently."""
+        if now is None:
+            now = time.time()
+        track = self.tracks.get(track_id)
+        if not track or track['last_blink'] is None:
+            return False
+        recent = now - track['last_blink'] <= BLINK_VALID_SECONDS
+        track['last_blink'] = None
+        return recent
+
+    def is_eye_closed(self, track_id):
+        track = self.tracks.get(track_id)
+        return bool(track and track.get('ear', 1.0) < self.threshold)
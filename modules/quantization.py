@@ -0,0 +1,196 @@
+"""
+Compact gallery representations and the matching kernels that work on them.
+  float64 - original encodings (1 KB per sample)
+  float16 - 4x smaller
+  int8    - 8x smaller, per-dimension offset/scale stored alongside
+All matchers return Euclidean distances, like face_recognition.face_distance.
+"""
+import numpy as np
+
+PRECISIONS = ('float64', 'float16', 'int8')
+CHUNK_SIZE = 16384      # صفوف المعرض في كل دفعة حساب (لتحديد الذاكرة)
+
+
+def quantize_int8(x, offset=None, scale=None):
+    """Per-dimension scalar quantization. Returns (codes int8, offset, scale)."""
+    x = np.asarray(x, dtype=np.float32)
+    if offset is None or scale is None:
+        low, high = x.min(axis=0), x.max(axis=0)
+        offset = (high + low) / 2.0
+        scale = np.maximum((high - low) / 254.0, 1e-8)
+    codes = np.clip(np.rint((x - offset) / scale), -127, 127).astype(np.int8)
+    return codes, np.asarray(offset, dtype=np.float32), np.asarray(scale, dtype=np.float32)
+
+
+def dequantize_int8(codes, offset, scale):
+    return codes.astype(np.float32) * scale + offset
+
+
+class Matcher:
+    """Base class: subclasses provide _squared(start, end, queries) for one gallery chunk."""
+    precision = None
+
+    def __len__(self):
+        return self.size
+
+    def nearest_batch(self, queries):
+        """Nearest gallery row and distance for every query, scanning the gallery in chunks."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        best_rows = np.full(len(queries), -1, dtype=np.int64)
+        best = np.full(len(queries), np.inf, dtype=np.float32)
+        for start in range(0, self.size, CHUNK_SIZE):
+            d2 = self._squared(start, min(start + CHUNK_SIZE, self.size), queries)
+            rows = d2.argmin(axis=1)
+            values = d2[np.arange(len(queries)), rows]
+            better = values < best
+            best[better] = values[better]
+            best_rows[better] = rows[better] + start
+        return best_rows, np.sqrt(np.maximum(best, 0))
+
+    def distances(self, query):
+        """Distances from one query to every gallery row."""
+        query = np.asarray(query, dtype=np.float32)[None, :]
+        out = np.empty(self.size, dtype=np.float32)
+        for start in range(0, self.size, CHUNK_SIZE):
+            end = min(start + CHUNK_SIZE, self.size)
+            out[start:end] = self._squared(start, end, query)[0]
+        return np.sqrt(np.maximum(out, 0))
+
+
+class Float64Matcher(Matcher):
+    precision = 'float64'
+
+    def __init__(self, vectors):
+        self.vectors = np.asarray(vectors, dtype=np.float64).reshape(-1, 128)
+        self.size = len(self.vectors)
+        self._norms = None
+
+    def _squared(self, start, end, queries):
+        if self._norms is None or len(self._norms) != self.size:
+            self._norms = (self.vectors ** 2).sum(axis=1)
+        queries = queries.astype(np.float64)
+        q_norms = (queries ** 2).sum(axis=1)
+        return self._norms[start:end][None, :] - 2.0 * queries @ self.vectors[start:end].T + q_norms[:, None]
+
+    def distances(self, query):
+        return np.linalg.norm(self.vectors - query, axis=1)
+
+    def add(self, vectors):
+        self.vectors = np.vstack([self.vectors, np.asarray(vectors, dtype=np.float64).reshape(-1, 128)])
+        self.size = len(self.vectors)
+
+    def to_float(self):
+        return self.vectors
+
+    def rows(self, indices):
+        return self.vectors[indices]
+
+    def nbytes(self):
+        return self.vectors.nbytes
+
+
+class Float16Matcher(Matcher):
+    precision = 'float16'
+
+    def __init__(self, vectors):
+        self.vectors = np.asarray(vectors).astype(np.float16, copy=False).reshape(-1, 128)
+        self.size = len(self.vectors)
+        self.norms = (self.vectors.astype(np.float32) ** 2).sum(axis=1)
+
+    def _squared(self, start, end, queries):
+        chunk = self.vectors[start:end].astype(np.float32)
+        q_norms = (queries ** 2).sum(axis=1)
+        return self.norms[start:end][None, :] - 2.0 * queries @ chunk.T + q_norms[:, None]
+
+    def add(self, vectors):
+        vectors = np.asarray(vectors).astype(np.float16).reshape(-1, 128)
+        self.vectors = np.vstack([self.vectors, vectors])
+        self.norms = np.concatenate([self.norms, (vectors.astype(np.float32) ** 2).sum(axis=1)])
+        self.size = len(self.vectors)
+
+    def to_float(self):
+        return self.vectors.astype(np.float32)
+
+    def rows(self, indices):
+        return self.vectors[indices].astype(np.float32)
+
+    def nbytes(self):
+        return self.vectors.nbytes + self.norms.nbytes
+
+
+class Int8Matcher(Matcher):
+    """
+    Distances are computed in the quantized space:
+    |x - y|^2 = sum_d s_d^2 (c_d - y'_d)^2  with  y' = (y - offset) / s
+    """
+    precision = 'int8'
+
+    def __init__(self, codes, offset, scale):
+        self.codes = np.asarray(codes, dtype=np.int8).reshape(-1, 128)
+        self.offset = np.asarray(offset, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.weights = self.scale ** 2
+        self.size = len(self.codes)
+        self.norms = self._row_norms(self.codes)
+
+    @classmethod
+    def from_vectors(cls, vectors):
+        return cls(*quantize_int8(vectors))
+
+    def _row_norms(self, codes):
+        return (codes.astype(np.float32) ** 2 @ self.weights).astype(np.float32)
+
+    def _squared(self, start, end, queries):
+        chunk = self.codes[start:end].astype(np.float32)
+        projected = (queries - self.offset) / self.scale
+        weighted = projected * self.weights
+        q_norms = (projected * weighted).sum(axis=1)
+        return self.norms[start:end][None, :] - 2.0 * weighted @ chunk.T + q_norms[:, None]
+
+    def _requantize(self, offset, scale):
+        if self.size:
+            self.codes, _, _ = quantize_int8(self.to_float(), offset, scale)
+        self.offset = np.asarray(offset, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.weights = self.scale ** 2
+        self.norms = self._row_norms(self.codes)
+
+    def add(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, 128)
+        if not len(vectors):
+            return
+        if self.size == 0:
+            self._requantize(*quantize_int8(vectors)[1:])
+        else:
+            # Samples outside the current range would be clipped (and never match):
+            # widen the range to cover them and re-quantize the stored rows once
+            low, high = self.offset - 127 * self.scale, self.offset + 127 * self.scale
+            if (vectors < low - self.scale / 2).any() or (vectors > high + self.scale / 2).any():
+                low, high = np.minimum(low, vectors.min(axis=0)), np.maximum(high, vectors.max(axis=0))
+                self._requantize((high + low) / 2.0, np.maximum((high - low) / 254.0, 1e-8))
+        codes, _, _ = quantize_int8(vectors, self.offset, self.scale)
+        self.codes = np.vstack([self.codes, codes])
+        self.norms = np.concatenate([self.norms, self._row_norms(codes)])
+        self.size = len(self.codes)
+
+    def to_float(self):
+        return dequantize_int8(self.codes, self.offset, self.scale)
+
+    def rows(self, indices):
+        return dequantize_int8(self.codes[indices], self.offset, self.scale)
+
+    def nbytes(self):
+        return self.codes.nbytes + self.norms.nbytes + self.offset.nbytes + self.scale.nbytes
+
+
+def make_matcher(vectors, precision='float64'):
+    """Builds a matcher over float vectors in the requested precision."""
+    if precision == 'float64':
+        return Float64Matcher(vectors)
+    if precision == 'float16':
+        return Float16Matcher(vectors)
+    if precision == 'int8':
+        if len(vectors) == 0:
+            return Int8Matcher(np.empty((0, 128), dtype=np.int8), np.zeros(128), np.ones(128))
+        return Int8Matcher.from_vectors(vectors)
+    raise ValueError(f"unknown precision '{precision}', expected one of {PRECISIONS}")
@@ -0,0 +1,47 @@
+"""
+Lazy loader for the recognition stack (cv2, dlib via face_recognition, cameras).
+The dashboard, employee list and CSV reports never touch it, so they start
+without paying the model-load cost.
+"""
+import threading
+from types import SimpleNamespace
+
+_lock = threading.Lock()
+_stack = None
+_warm_thread = None
+
+
+def is_loaded():
+    return _stack is not None
+
+
+def load():
+    """Imports the recognition modules once and returns them. Blocks until ready."""
+    global _stack
+    if _stack is not None:
+        return _stack
+    with _lock:
+        if _stack is None:
+            import numpy as np
+            import face_recognition   # loads dlib and its model files
+            from modules.camera import VideoCamera
+            from modules.registration import RegistrationCamera
+
+            # One tiny pass so the detector/encoder are fully initialised before the first frame
+            face_recognition.face_locations(np.zeros((32, 32, 3), dtype=np.uint8))
+
+            _stack = SimpleNamespace(
+                face_recognition=face_recognition,
+                VideoCamera=VideoCamera,
+                RegistrationCamera=RegistrationCamera,
+            )
+    return _stack
+
+
+def warm_up_async():
+    """Starts loading the models in a background thread (no-op if already loaded or loading)."""
+    global _warm_thread
+    if _stack is not None or (_warm_thread is not None and _warm_thread.is_alive()):
+        return
+    _warm_thread = threading.Thread(target=load, name="recognition-warmup", daemon=True)
+    _warm_thread.start()
@@ -0,0 +1,78 @@
+import cv2
+import face_recognition
+import time
+from modules import db_manager
+from modules import gallery
+from modules.stream_encoder import StreamEncoder
+from modules.frame_pool import FramePool
+from modules import tracing
+
+# --- كلاس كاميرا التسجيل (لإضافة موظف جديد) ---
+class RegistrationCamera:
+    def __init__(self, user_name):
+        self.video = cv2.VideoCapture(0)
+        self.user_name = user_name
+        self.encodings = []
+        self.max_samples = 20 # عدد الصور المطلوبة
+        self.sample_interval = 0.1 # أقل مدة بين عينتين (ثانية)
+        self._last_sample = 0
+        self.is_finished = False
+        self.encoder = StreamEncoder()
+        self.pool = FramePool()
+
+    def __del__(self):
+        self.video.release()
+
+    def release(self):
+        self.video.release()
+
+    @tracing.traced("RegistrationCamera.get_frame")
+    def get_frame(self):
+        with tracing.span("capture"):
+            success, frame = self.pool.read(self.video)
+        if not success: return None
+
+        with tracing.span("resize"):
+            rgb_frame = self.pool.to_rgb('rgb', frame)
+        with tracing.span("detect"):
+            face_locations = face_recognition.face_locations(rgb_frame)
+        
+        # الرسم والتوجيه
+        color = (0, 165, 255) # برتقالي
+        msg = "Looking for face..."
+
+        if len(face_locations) == 1:
+            if len(self.encodings) < self.max_samples:
+                msg = f"Capturing: {len(self.encodings)}/{self.max_samples}"
+                color = (0, 255, 0)
+                # Spread the samples over time instead of sleeping, so the preview keeps moving
+                if time.time() - self._last_sample >= self.sample_interval:
+                    try:
+                        with tracing.span("encode"):
+                            encoding = face_recognition.face_encodings(rgb_frame, face_locations)[0]
+                        self.encodings.append(encoding)
+                        self._last_sample = time.time()
+                        msg = f"Capturing: {len(self.encodings)}/{self.max_samples}"
+                    except:
+                        pass
+            else:
+                msg = "Done! Saving..."
+                self.is_finished = True
+        
+        # رسم المربع والنص
+        if len(face_locations) > 0:
+            top, right, bottom, left = face_locations[0]
+            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+        
+        cv2.putText(frame, msg, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+        
+        with tracing.span("jpeg"):
+            return self.encoder.encode(frame)
+
+    def save_data(self):
+        if self.encodings:
+            user_id = db_manager.add_user_with_encodings(self.user_name, self.encodings)
+            if user_id is not None:
+                gallery.notify_user_added(user_id, self.user_name, self.encodings)
+            return True
+        return False
@@ -0,0 +1,112 @@
+import time
+import threading
+import cv2
+import numpy as np
+from modules.frame_pool import FramePool
+
+# إعدادات البث (MJPEG)
+STREAM_WIDTH = 640          # أقصى عرض للصورة المرسلة للمتصفح (None = الحجم الأصلي)
+JPEG_QUALITY = 70
+IDLE_FPS = 2                # معدل الإرسال عندما لا تتغير الصورة
+CHANGE_THRESHOLD = 2.0      # متوسط الفرق (0-255) الذي نعتبر عنده الصورة "تغيرت"
+SIGNATURE_SIZE = (32, 24)
+
+# Optional faster JPEG backends, used when installed.
+try:
+    from turbojpeg import TurboJPEG
+    _turbo = TurboJPEG()
+except Exception:
+    _turbo = None
+
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+
+def get_backend_name():
+    if _turbo is not None:
+        return "turbojpeg"
+    if simplejpeg is not None:
+        return "simplejpeg"
+    return "opencv"
+
+
+def encode_jpeg(frame, quality=JPEG_QUALITY):
+    """Encodes a BGR frame to JPEG bytes with the fastest available backend."""
+    if _turbo is not None:
+        return _turbo.encode(frame, quality=quality)
+    if simplejpeg is not None:
+        return simplejpeg.encode_jpeg(np.ascontiguousarray(frame), quality=quality, colorspace='BGR')
+    ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ret:
+        return None
+    return jpeg.tobytes()
+
+
+class StreamEncoder:
+    """
+    Turns processed frames into MJPEG parts for the browser.
+    Encoding is skipped when nobody is watching, frames are downscaled to
+    the stream width, and frames that did not change are sent at IDLE_FPS only.
+    """
+    def __init__(self, width=STREAM_WIDTH, quality=JPEG_QUALITY, idle_fps=IDLE_FPS,
+                 change_threshold=CHANGE_THRESHOLD):
+        self.width = width
+        self.quality = quality
+        self.idle_interval = 1.0 / idle_fps if idle_fps else 0
+        self.change_threshold = change_threshold
+
+        self.subscribers = 0
+        self._lock = threading.Lock()
+        self._last_signature = None
+        self._last_sent = 0
+        self.pool = FramePool()
+
+    def add_subscriber(self):
+        with self._lock:
+            self.subscribers += 1
+
+    def remove_subscriber(self):
+        with self._lock:
+            self.subscribers = max(0, self.subscribers - 1)
+
+    def has_subscribers(self):
+        return self.subscribers > 0
+
+    def _signature(self, frame):
+        # Strided view first so the signature costs almost nothing on 1080p frames
+        gray = self.pool.convert('signature_gray', self.pool.strided('signature_src', frame, 8),
+                                 cv2.COLOR_BGR2GRAY, channels=1)
+        small = self.pool.resize('signature', gray, size=SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+        return small.astype(np.int16)
+
+    def _is_unchanged(self, signature):
+        if self._last_signature is None:
+            return False
+        diff = np.abs(signature - self._last_signature).mean()
+        return diff < self.change_threshold
+
+    def encode(self, frame, force=False):
+        """
+        Returns JPEG bytes, or None when the frame should not be sent
+        (no subscribers, or unchanged and inside the idle interval).
+        force=True always sends (e.g. when the overlay was just updated).
+        """
+        if not self.has_subscribers():
+            return None
+
+        now = time.time()
+        signature = self._signature(frame)
+        if not force and self._is_unchanged(signature) and (now - self._last_sent) < self.idle_interval:
+            return None
+
+        if self.width and frame.shape[1] > self.width:
+            height = int(frame.shape[0] * self.width / frame.shape[1])
+            frame = self.pool.resize('stream', frame, size=(self.width, height), interpolation=cv2.INTER_AREA)
+
+        jpeg = encode_jpeg(frame, self.quality)
+        if jpeg is not None:
+            self._last_signature = signature
+            self._last_sent = now
+        return jpeg
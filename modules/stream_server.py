@@ -0,0 +1,273 @@
+"""
+Asyncio server for the long-lived streaming routes:
+  /video_feed         MJPEG from the recognition worker (or an in-process camera)
+  /training_feed      MJPEG preview of an enrollment job (?job=ID)
+  /attendance_events  Server-Sent Events from the recognition worker
+Every viewer is a coroutine on one event loop instead of a pinned Flask thread.
+Each source has a single upstream reader thread; viewers always get the newest
+frame, so a slow viewer skips frames and never holds back the others.
+"""
+import json
+import asyncio
+import threading
+from urllib.parse import parse_qs
+from modules import frame_bus
+
+STREAM_HOST = '0.0.0.0'
+STREAM_PORT = 5001
+MAX_VIEWERS = 500
+WRITE_BUFFER_BYTES = 256 * 1024     # فوق هذا الحجم ننتظر المتصفح قبل إرسال إطار جديد
+WRITE_TIMEOUT = 15                  # مشاهد لا يستقبل شيئاً خلال هذه المدة يُفصل
+REQUEST_TIMEOUT = 10
+EVENT_QUEUE_SIZE = 100
+KEEPALIVE_SECONDS = 15
+
+MJPEG_TYPE = 'multipart/x-mixed-replace; boundary=frame'
+END = object()  # the source has finished (e.g. enrollment done)
+
+
+def mjpeg_part(jpeg):
+    return b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n\r\n'
+
+
+class Broadcast:
+    """Newest-value slot shared by all viewers of a source. Lives on the event loop."""
+    def __init__(self):
+        self.value = None
+        self.seq = 0
+        self._changed = asyncio.Event()
+
+    def publish(self, value):
+        self.value = value
+        self.seq += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_newer(self, seen):
+        while self.seq == seen:
+            await self._changed.wait()
+        return self.seq, self.value
+
+
+class ThreadedSource:
+    """
+    Runs a blocking producer in a thread while at least one viewer is connected.
+    open_producer() -> (iterable, close); every item is handed to on_item on the loop.
+    """
+    def __init__(self, loop, open_producer, on_item):
+        self.loop = loop
+        self.open_producer = open_producer
+        self.on_item = on_item
+        self.viewers = 0
+        self._thread = None
+        self._stop = None
+        self._close = None      # (stop event, close callable) of the running producer
+        self._close_lock = threading.Lock()
+
+    def join(self):
+        self.viewers += 1
+        # A thread that is still winding down after the last viewer left is replaced, not reused
+        if self._thread is None or not self._thread.is_alive() or self._stop.is_set():
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), daemon=True)
+            self._thread.start()
+
+    def leave(self):
+        self.viewers -= 1
+        if self.viewers == 0 and self._stop is not None:
+            # Last viewer gone: stop reading so the worker/camera stops encoding
+            self._stop.set()
+            self._call_close(self._stop)
+
+    def _call_close(self, stop):
+        """Closes the producer started for stop (not a newer one that replaced it)."""
+        with self._close_lock:
+            if self._close is None or self._close[0] is not stop:
+                return
+            close = self._close[1]
+            self._close = None
+        if close:
+            close()
+
+    def _run(self, stop):
+        try:
+            items, close = self.open_producer(stop)
+            with self._close_lock:
+                self._close = (stop, close)
+            if stop.is_set():
+                self._call_close(stop)
+            for item in items:
+                if stop.is_set():
+                    break
+                self.loop.call_soon_threadsafe(self.on_item, item)
+        except (EOFError, OSError) as e:
+            if not stop.is_set():
+                print(f"[WARN] Stream source stopped: {e}")
+        except Exception as e:
+            # Closing the connection under a blocked recv() raises all sorts of errors; only report real failures
+            if not stop.is_set():
+                print(f"[ERROR] Stream source failed: {e}")
+        finally:
+            if not stop.is_set():
+                # The source ended by itself (enrollment finished, worker gone): end the viewers' streams
+                self.loop.call_soon_threadsafe(self.on_item, END)
+
+
+def _camera_frames(camera, stop):
+    camera.encoder.add_subscriber()
+    try:
+        while not stop.is_set() and not getattr(camera, 'is_finished', False):
+            frame = camera.get_frame()
+            if frame:
+                yield frame
+    finally:
+        camera.encoder.remove_subscriber()
+
+
+class StreamServer:
+    def __init__(self, host=STREAM_HOST, port=STREAM_PORT, get_enrollment=None):
+        self.host = host
+        self.port = port
+        self.get_enrollment = get_enrollment
+        self.viewers = 0
+        self.loop = None
+
+    # --- sources ---
+    def _open_video(self, stop):
+        try:
+            subscriber = frame_bus.FrameSubscriber('frames')
+            return subscriber.frames(), subscriber.close
+        except OSError:
+            from modules import recognition
+            return _camera_frames(recognition.load().VideoCamera(), stop), None
+
+    def _training_source(self, job_id):
+        """(broadcast, source) for one enrollment job's preview, created by its first viewer."""
+        if job_id not in self.training:
+            job = self.get_enrollment(job_id) if self.get_enrollment else None
+            if job is None:
+                return None
+            broadcast = Broadcast()
+            source = ThreadedSource(self.loop, lambda stop: (job.frames(stop), None), broadcast.publish)
+            self.training[job_id] = (broadcast, source)
+        return self.training[job_id]
+
+    def _open_events(self, stop):
+        subscriber = frame_bus.FrameSubscriber('events')
+        return (event for event in subscriber.events() if event is not None), subscriber.close
+
+    def _fan_out(self, item):
+        for queue in list(self.event_queues):
+            if queue.full():
+                # Viewer is not reading: drop it, EventSource reconnects on its own
+                self.event_queues.discard(queue)
+            else:
+                queue.put_nowait(item)
+
+    def _setup(self):
+        self.video = Broadcast()
+        self.training = {}
+        self.event_queues = set()
+        self.sources = {
+            'video': ThreadedSource(self.loop, self._open_video, self.video.publish),
+            'events': ThreadedSource(self.loop, self._open_events, self._fan_out),
+        }
+
+    # --- HTTP ---
+    async def _send(self, writer, data):
+        writer.write(data)
+        await asyncio.wait_for(writer.drain(), WRITE_TIMEOUT)
+
+    async def _respond(self, writer, status, content_type, body=b''):
+        head = (f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                "Cache-Control: no-cache\r\nConnection: close\r\nAccess-Control-Allow-Origin: *\r\n")
+        if body:
+            head += f"Content-Length: {len(body)}\r\n"
+        await self._send(writer, (head + "\r\n").encode() + body)
+
+    async def _serve_frames(self, writer, source, broadcast):
+        await self._respond(writer, "200 OK", MJPEG_TYPE)
+        seen = broadcast.seq
+        source.join()
+        try:
+            while True:
+                seen, frame = await broadcast.wait_newer(seen)
+                if frame is END:
+                    break
+                # drain() blocks while the socket buffer is full; frames published meanwhile are skipped
+                await self._send(writer, mjpeg_part(frame))
+        finally:
+            source.leave()
+
+    async def _serve_events(self, writer):
+        if not await self.loop.run_in_executor(None, frame_bus.is_worker_running):
+            await self._respond(writer, "503 Service Unavailable", "application/json",
+                                json.dumps({'error': 'recognition worker is not running'}).encode())
+            return
+        await self._respond(writer, "200 OK", "text/event-stream")
+        queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.event_queues.add(queue)
+        self.sources['events'].join()
+        try:
+            while queue in self.event_queues or not queue.empty():
+                try:
+                    event = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    await self._send(writer, b': keepalive\n\n')
+                    continue
+                if event is END:
+                    break
+                await self._send(writer, f'data: {json.dumps(event)}\n\n'.encode())
+        finally:
+            self.event_queues.discard(queue)
+            self.sources['events'].leave()
+
+    async def _handle(self, reader, writer):
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_BYTES)
+        self.viewers += 1
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), REQUEST_TIMEOUT)
+            method, target = head.split(b'\r\n', 1)[0].decode('latin-1').split(' ')[:2]
+            path, _, query = target.partition('?')
+
+            if self.viewers > MAX_VIEWERS:
+                await self._respond(writer, "503 Service Unavailable", "text/plain", b"too many viewers")
+            elif method != 'GET':
+                await self._respond(writer, "405 Method Not Allowed", "text/plain", b"GET only")
+            elif path == '/video_feed':
+                await self._serve_frames(writer, self.sources['video'], self.video)
+            elif path == '/training_feed':
+                job_id = parse_qs(query).get('job', [''])[0]
+                entry = self._training_source(job_id)
+                if entry is None:
+                    await self._respond(writer, "404 Not Found", "text/plain", b"unknown enrollment")
+                else:
+                    broadcast, source = entry
+                    try:
+                        await self._serve_frames(writer, source, broadcast)
+                    finally:
+                        if source.viewers == 0:
+                            self.training.pop(job_id, None)
+            elif path == '/attendance_events':
+                await self._serve_events(writer)
+            else:
+                await self._respond(writer, "404 Not Found", "text/plain", b"not found")
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.viewers -= 1
+            writer.close()
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._setup()
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        print(f"🟢 Async streams on http://{self.host}:{self.port} (/video_feed, /training_feed, /attendance_events)")
+        async with server:
+            await server.serve_forever()
+
+    def start_in_thread(self):
+        """Runs the event loop in a daemon thread next to the Flask server."""
+        thread = threading.Thread(target=asyncio.run, args=(self.serve(),), name="stream-server", daemon=True)
+        thread.start()
+        return thread
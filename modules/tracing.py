@@ -0,0 +1,152 @@
+"""
+Opt-in per-frame timeline tracer.
+Spans (capture, resize, detect, landmarks, encode, match, DB calls, draw,
+JPEG...) are kept in a bounded ring buffer and dumped as a Chrome trace
+JSON file that opens in chrome://tracing or https://ui.perfetto.dev.
+
+Enable with the ATTENDANCE_TRACE=1 environment variable or tracing.enable().
+When disabled, span() and @traced cost one attribute check.
+Dump with tracing.dump(path), the /debug/trace route, or SIGUSR1
+(SIGBREAK on Windows) once install_signal_handler() was called.
+"""
+import os
+import json
+import time
+import signal
+import functools
+import threading
+from collections import deque
+from contextlib import nullcontext
+
+TRACE_BUFFER_EVENTS = 200000    # أقدم الأحداث تُحذف عند امتلاء الذاكرة
+TRACE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'traces')
+DB_FUNCTIONS_EXCLUDED = ('get_db_connection', 'init_db')
+
+enabled = False
+_events = deque(maxlen=TRACE_BUFFER_EVENTS)
+_thread_names = {}
+_pid = os.getpid()
+_null = nullcontext()
+
+
+def _now_us():
+    return time.perf_counter_ns() // 1000
+
+
+class _Span:
+    __slots__ = ('name', 'cat', 'args', 'start')
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        end = _now_us()
+        thread = threading.current_thread()
+        _thread_names[thread.ident] = thread.name
+        event = {"name": self.name, "cat": self.cat, "ph": "X", "ts": self.start, "dur": end - self.start,
+                 "pid": _pid, "tid": thread.ident}
+        if self.args:
+            event["args"] = self.args
+        _events.append(event)     # deque.append is thread-safe
+        return False
+
+
+def span(name, cat="frame", **args):
+    """with tracing.span('detect'): ... — records a complete event when tracing is on."""
+    if not enabled:
+        return _null
+    return _Span(name, cat, args)
+
+
+def traced(name=None, cat="frame"):
+    """Decorator version of span(); the name defaults to the function's qualified name."""
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _Span(label, cat, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instant(name, cat="frame", **args):
+    """A zero-length marker (e.g. 'attendance marked')."""
+    if enabled:
+        thread = threading.current_thread()
+        _thread_names[thread.ident] = thread.name
+        _events.append({"name": name, "cat": cat, "ph": "i", "s": "t", "ts": _now_us(),
+                        "pid": _pid, "tid": thread.ident, "args": args})
+
+
+def _instrument_db():
+    """Wraps every public db_manager function in a 'db' span (done once, on enable)."""
+    from modules import db_manager
+    if getattr(db_manager, '_traced', False):
+        return
+    for attr, value in list(vars(db_manager).items()):
+        if callable(value) and not attr.startswith('_') and getattr(value, '__module__', None) == db_manager.__name__ \
+                and attr not in DB_FUNCTIONS_EXCLUDED and not isinstance(value, type):
+            setattr(db_manager, attr, traced(f"db.{attr}", cat="db")(value))
+    db_manager._traced = True
+
+
+def enable(buffer_events=None):
+    global enabled, _events
+    if buffer_events:
+        _events = deque(_events, maxlen=buffer_events)
+    _instrument_db()
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def clear():
+    _events.clear()
+
+
+def trace_json():
+    """The buffered events as a Chrome trace object (the buffer is left intact)."""
+    events = list(_events)
+    meta = [{"name": "process_name", "ph": "M", "pid": _pid, "args": {"name": "attendance"}}]
+    for tid, name in list(_thread_names.items()):
+        meta.append({"name": "thread_name", "ph": "M", "pid": _pid, "tid": tid, "args": {"name": name}})
+    return {"traceEvents": meta + events, "displayTimeUnit": "ms"}
+
+
+def dump(path=None):
+    """Writes the trace to path (default traces/trace_<time>.json) and returns the path."""
+    if path is None:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        path = os.path.join(TRACE_DIR, time.strftime("trace_%Y%m%d_%H%M%S.json"))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trace_json(), f)
+    return path
+
+
+def install_signal_handler():
+    """SIGUSR1 (SIGBREAK on Windows, Ctrl+Break) dumps the trace to TRACE_DIR."""
+    signum = getattr(signal, 'SIGUSR1', None) or getattr(signal, 'SIGBREAK', None)
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+
+    def handler(*_):
+        print(f"🧵 Trace written to {dump()}")
+    signal.signal(signum, handler)
+    return True
+
+
+if os.environ.get('ATTENDANCE_TRACE') == '1':
+    enable()
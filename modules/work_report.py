@@ -0,0 +1,161 @@
+"""
+Monthly work-time report: first check-in, last check-out, hours on site,
+late arrivals and working-day-aware absence for every employee.
+The month is read in one range scan (db_manager.get_daily_spans) and
+aggregated for all employees at once with NumPy.
+
+Weekends and holidays come from database/work_calendar.json when it exists:
+  {"weekend_days": [4, 5], "holidays": {"2025-03-30": "Eid al-Fitr"},
+   "work_start": "09:00", "late_grace_minutes": 10}
+weekend_days uses Python numbering (Monday = 0 ... Sunday = 6).
+"""
+import os
+import json
+import calendar
+from datetime import date, datetime, timedelta
+import numpy as np
+from modules import db_manager
+
+CALENDAR_PATH = os.path.join(db_manager.BASE_DIR, 'database', 'work_calendar.json')
+WEEKEND_DAYS = (4, 5)       # الجمعة والسبت
+WORK_START = "09:00"
+LATE_GRACE_MINUTES = 10     # التأخير يُحسب بعد بداية الدوام + هذه الدقائق
+
+
+class WorkCalendar:
+    def __init__(self, weekend_days=WEEKEND_DAYS, holidays=None, work_start=WORK_START,
+                 late_grace_minutes=LATE_GRACE_MINUTES):
+        self.weekend_days = set(weekend_days)
+        self.holidays = {}
+        for day, name in (holidays or {}).items():
+            self.holidays[date.fromisoformat(day) if isinstance(day, str) else day] = name
+        hours, minutes = map(int, work_start.split(':'))
+        self.work_start = work_start
+        self.late_grace_minutes = late_grace_minutes
+        self.late_after_seconds = hours * 3600 + (minutes + late_grace_minutes) * 60
+
+    @classmethod
+    def load(cls, path=CALENDAR_PATH):
+        """The calendar from the JSON file, or the defaults when there is none."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        holidays = config.get("holidays", {})
+        if isinstance(holidays, list):
+            holidays = {day: "Holiday" for day in holidays}
+        return cls(config.get("weekend_days", WEEKEND_DAYS), holidays,
+                   config.get("work_start", WORK_START), config.get("late_grace_minutes", LATE_GRACE_MINUTES))
+
+    def day_type(self, day):
+        if day in self.holidays:
+            return "holiday"
+        if day.weekday() in self.weekend_days:
+            return "weekend"
+        return "work"
+
+    def working_mask(self, year, month):
+        """Boolean array, one entry per day of the month."""
+        _, num_days = calendar.monthrange(year, month)
+        return np.array([self.day_type(date(year, month, d)) == "work" for d in range(1, num_days + 1)])
+
+
+def _clock(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+
+def monthly_report(month_str, work_calendar=None, today=None, details=False):
+    """
+    month_str: 'YYYY-MM'. For the current month only days up to today count.
+    Returns {"month", "working_days", "employees": [...]}; with details=True every
+    employee also gets "days": one entry per day present.
+    """
+    work_calendar = work_calendar or WorkCalendar.load()
+    today = today or date.today()
+    year, month = map(int, month_str.split('-'))
+    _, num_days = calendar.monthrange(year, month)
+    month_start = date(year, month, 1)
+    month_end = month_start + timedelta(days=num_days)
+
+    if (year, month) == (today.year, today.month):
+        elapsed_days = today.day
+    elif month_start > today:
+        elapsed_days = 0
+    else:
+        elapsed_days = num_days
+    working = work_calendar.working_mask(year, month)
+    working_days = int(working[:elapsed_days].sum())
+
+    conn = db_manager.get_db_connection()
+    users = conn.execute('SELECT id, name FROM users ORDER BY id').fetchall()
+    conn.close()
+    rows = db_manager.get_daily_spans(month_start.isoformat(), month_end.isoformat())
+
+    user_ids = np.array([u['id'] for u in users], dtype=np.int64)
+    n = len(users)
+    present = np.zeros(n, dtype=np.int64)
+    present_working = np.zeros(n, dtype=np.int64)
+    late = np.zeros(n, dtype=np.int64)
+    hours = np.zeros(n)
+    first_in_sum = np.zeros(n)
+
+    if rows and n:
+        row_users = np.array([r['user_id'] for r in rows], dtype=np.int64)
+        first = np.array([r['first_in'] for r in rows], dtype='datetime64[s]')
+        last = np.array([r['last_out'] for r in rows], dtype='datetime64[s]')
+        day = first.astype('datetime64[D]')
+        day_index = (day - np.datetime64(month_start)).astype(np.int64)
+        first_seconds = (first - day).astype(np.int64)
+        span_hours = (last - first).astype(np.int64) / 3600.0
+
+        # Rows of deleted employees are dropped
+        idx = np.clip(np.searchsorted(user_ids, row_users), 0, n - 1)
+        keep = user_ids[idx] == row_users
+        idx, day_index, first_seconds, span_hours = idx[keep], day_index[keep], first_seconds[keep], span_hours[keep]
+        on_working_day = working[day_index]
+        is_late = on_working_day & (first_seconds > work_calendar.late_after_seconds)
+
+        present = np.bincount(idx, minlength=n)
+        present_working = np.bincount(idx[on_working_day], minlength=n)
+        late = np.bincount(idx[is_late], minlength=n)
+        hours = np.bincount(idx, weights=span_hours, minlength=n)
+        first_in_sum = np.bincount(idx[on_working_day], weights=first_seconds[on_working_day], minlength=n)
+
+    employees = []
+    for k, user in enumerate(users):
+        employees.append({
+            "user_id": user['id'],
+            "name": user['name'],
+            "working_days": working_days,
+            "present": int(present_working[k]),
+            "absent": max(0, working_days - int(present_working[k])),
+            "off_days_worked": int(present[k] - present_working[k]),
+            "late": int(late[k]),
+            "hours": round(float(hours[k]), 2),
+            "avg_hours": round(float(hours[k] / present[k]), 2) if present[k] else 0.0,
+            "avg_first_in": _clock(first_in_sum[k] / present_working[k]) if present_working[k] else "",
+        })
+
+    if details:
+        by_id = {e["user_id"]: e for e in employees}
+        for e in employees:
+            e["days"] = []
+        for r in rows:
+            employee = by_id.get(r['user_id'])
+            if employee is None:
+                continue
+            first = datetime.strptime(r['first_in'], "%Y-%m-%d %H:%M:%S")
+            last = datetime.strptime(r['last_out'], "%Y-%m-%d %H:%M:%S")
+            day_type = work_calendar.day_type(first.date())
+            seconds = first.hour * 3600 + first.minute * 60 + first.second
+            employee["days"].append({
+                "date": first.date().isoformat(),
+                "day_type": day_type,
+                "first_in": first.strftime("%H:%M:%S"),
+                "last_out": last.strftime("%H:%M:%S") if r['marks'] > 1 else "",
+                "hours": round((last - first).total_seconds() / 3600.0, 2),
+                "late": day_type == "work" and seconds > work_calendar.late_after_seconds,
+            })
+
+    return {"month": month_str, "working_days": working_days, "employees": employees}
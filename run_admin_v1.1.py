@@ -3,6 +3,7 @@ import face_recognition
 import os
 import numpy as np
 from modules import db_manager
+from modules.frame_pool import FramePool
 import time
 
 def main():
@@ -22,14 +23,15 @@ def main():
     
     captured_encodings = []
     REQUIRED_SAMPLES = 15  
+    pool = FramePool()
     
     while len(captured_encodings) < REQUIRED_SAMPLES:
-        ret, frame = video_capture.read()
+        ret, frame = pool.read(video_capture)
         if not ret: break
         
-        display_frame = frame.copy()
-        
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # rgb_frame is converted before anything is drawn, so the overlay can go on the frame itself
+        rgb_frame = pool.to_rgb('rgb', frame)
+        display_frame = frame
         
         face_locations = face_recognition.face_locations(rgb_frame)
         
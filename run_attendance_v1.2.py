@@ -5,7 +5,7 @@ from modules import db_manager
 import time
 import os
 from datetime import datetime
-from scipy.spatial import distance as dist
+from modules.liveness import eye_aspect_ratio
 
 CONFIDENCE_THRESHOLD = 0.50   
 EYE_ASPECT_RATIO_THRESHOLD = 0.25 
@@ -17,11 +17,7 @@ if not os.path.exists(EVIDENCE_DIR):
     os.makedirs(EVIDENCE_DIR)
 
 def get_eye_aspect_ratio(eye):
-    A = dist.euclidean(eye[1], eye[5])
-    B = dist.euclidean(eye[2], eye[4])
-    C = dist.euclidean(eye[0], eye[3])
-    ear = (A + B) / (2.0 * C)
-    return ear
+    return eye_aspect_ratio(eye)
 
 def save_evidence(frame, name):
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
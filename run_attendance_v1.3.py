@@ -4,42 +4,66 @@ import numpy as np
 from modules import db_manager
 import time
 import os
+import sys
+import json
+import argparse
+import contextlib
 from datetime import datetime
-from scipy.spatial import distance as dist
+from modules.liveness import LivenessTracker
+from modules.gallery import Gallery
+from modules.face_detector import FaceDetector, DETECTOR, DETECTORS
+from modules import face_crops
+from modules import evidence
+from modules import tracing
 
 CONFIDENCE_THRESHOLD = 0.50
 EYE_ASPECT_RATIO_THRESHOLD = 0.25
 CONSECUTIVE_FRAMES = 2        
-COOLDOWN_SECONDS = 60
-
-EVIDENCE_DIR = "attendance_evidence"
-if not os.path.exists(EVIDENCE_DIR):
-    os.makedirs(EVIDENCE_DIR)
-
-def get_eye_aspect_ratio(eye):
-    A = dist.euclidean(eye[1], eye[5])
-    B = dist.euclidean(eye[2], eye[4])
-    C = dist.euclidean(eye[0], eye[3])
-    ear = (A + B) / (2.0 * C)
-    return ear
-
-def save_evidence(frame, name):
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"{EVIDENCE_DIR}/{name}_{timestamp}.jpg"
-    cv2.imwrite(filename, frame)
-    print(f"📸 Evidence saved: {filename}")
-
-def main():
+
+@tracing.traced("analyze_frame")
+def analyze_frame(frame, gallery, liveness, now=None, detector=None, hints=()):
+    """
+    Detection, matching and blink check on one frame (first face only).
+    detector: FaceDetector (default: dlib HOG on the whole frame); hints: last face boxes.
+    Returns None when there is no face, else a dict with the face box
+    (0.25x coordinates), user_id/name (None if unknown), distance, blinked, eye_closed.
+    """
+    with tracing.span("resize"):
+        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+
+    with tracing.span("detect"):
+        face_locations = detector.detect(rgb_small_frame, hints) if detector else face_recognition.face_locations(rgb_small_frame)
+    if len(face_locations) == 0:
+        return None
+
+    # Detected on the 0.25x frame, encoded from full-resolution crops of the original
+    with tracing.span("encode", faces=len(face_locations)):
+        face_encodings, face_landmarks_list = face_crops.encode_faces(frame, face_locations)
+    with tracing.span("liveness"):
+        track_ids = liveness.update(face_locations, face_landmarks_list, now=now)
+
+    with tracing.span("match"):
+        user_id, name, distance = gallery.match(face_encodings[0], tolerance=CONFIDENCE_THRESHOLD)
+    blinked = user_id is not None and liveness.consume_blink(track_ids[0], now=now)
+    return {
+        "face_loc": face_locations[0],
+        "user_id": user_id,
+        "name": name,
+        "distance": distance,
+        "blinked": blinked,
+        "eye_closed": liveness.is_eye_closed(track_ids[0]),
+    }
+
+def main(detector_mode=DETECTOR):
     print("--- ⚡ Fast Pro System: Liveness & Security (V4) ---")
     
-    users = db_manager.get_all_embeddings()
-    known_face_encodings = [user["encoding"] for user in users]
-    known_face_names = [user["name"] for user in users]
-    known_face_ids = [user["id"] for user in users]
+    gallery = Gallery()
+    detector = FaceDetector(detector_mode)
+    hints = []
     
-    last_attendance = {}
-    blink_counter = 0
-    is_eye_closed = False
+    liveness = LivenessTracker(threshold=EYE_ASPECT_RATIO_THRESHOLD, consecutive_frames=CONSECUTIVE_FRAMES)
+    evidence_writer = evidence.get_writer()
 
     video_capture = cv2.VideoCapture(0)
     
@@ -48,77 +72,169 @@ def main():
     print("🟢 The express system is ready... (Blink to register attendance!) 😉")
 
     while True:
-        ret, frame = video_capture.read()
+        with tracing.span("capture"):
+            ret, frame = video_capture.read()
         if not ret: break
 
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-        face_locations = face_recognition.face_locations(rgb_small_frame)
+        result = analyze_frame(frame, gallery, liveness, detector=detector, hints=hints)
+        hints = [result["face_loc"]] if result else []
         
-        if len(face_locations) > 0:
-            face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-            
-            face_landmarks_list = face_recognition.face_landmarks(rgb_small_frame, face_locations)
-
-            face_encoding = face_encodings[0]
-            face_loc = face_locations[0]
-            
-            face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-            best_match_index = np.argmin(face_distances)
+        if result is not None:
+            face_loc = result["face_loc"]
+            user_id = result["user_id"]
             
             name = "Unknown"
             color = (0, 0, 255)
             status_text = "Look at Camera"
 
-            if face_distances[best_match_index] < CONFIDENCE_THRESHOLD:
-                name = known_face_names[best_match_index]
-                user_id = known_face_ids[best_match_index]
+            if user_id is not None:
+                name = result["name"]
                 
-                if len(face_landmarks_list) > 0:
-                    face_landmarks = face_landmarks_list[0]
-                    left_eye = face_landmarks['left_eye']
-                    right_eye = face_landmarks['right_eye']
-
-                    leftEAR = get_eye_aspect_ratio(left_eye)
-                    rightEAR = get_eye_aspect_ratio(right_eye)
-                    avgEAR = (leftEAR + rightEAR) / 2.0
-
-                    if avgEAR < EYE_ASPECT_RATIO_THRESHOLD:
-                        blink_counter += 1
-                        status_text = "Blinking..."
-                    else:
-                        if blink_counter >= CONSECUTIVE_FRAMES:
-                            is_eye_closed = True
-                        blink_counter = 0
-                        status_text = "Verified - Blink Now"
-
-                if is_eye_closed:
+                if result["eye_closed"]:
+                    status_text = "Blinking..."
+                else:
+                    status_text = "Verified - Blink Now"
+
+                if result["blinked"]:
                     color = (0, 255, 0)
                     status_text = f"Confirmed: {name}"
                     
-                    current_time = time.time()
-                    if user_id not in last_attendance or (current_time - last_attendance[user_id] > COOLDOWN_SECONDS):
-                        db_manager.mark_attendance(user_id)
-                        save_evidence(frame, name) 
-                        last_attendance[user_id] = current_time
-                        is_eye_closed = False
+                    attendance_id = db_manager.mark_attendance(user_id)
+                    if attendance_id is not None:
+                        top, right, bottom, left = face_loc
+                        evidence_writer.submit(frame, (top * 4, right * 4, bottom * 4, left * 4), attendance_id, user_id)
                         print(f"✅ Fast Attendance: {name}")
 
             else:
                 status_text = "Unknown Person"
 
-            top, right, bottom, left = face_loc
-            top *= 4; right *= 4; bottom *= 4; left *= 4
-            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-            cv2.putText(frame, status_text, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-            cv2.putText(frame, name, (left, bottom + 30), cv2.FONT_HERSHEY_DUPLEX, 1.0, (255, 255, 255), 1)
+            with tracing.span("draw"):
+                top, right, bottom, left = face_loc
+                top *= 4; right *= 4; bottom *= 4; left *= 4
+                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+                cv2.putText(frame, status_text, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+                cv2.putText(frame, name, (left, bottom + 30), cv2.FONT_HERSHEY_DUPLEX, 1.0, (255, 255, 255), 1)
 
-        cv2.imshow('Fast Security Attendance', frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'): break
+        with tracing.span("display"):
+            cv2.imshow('Fast Security Attendance', frame)
+            key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'): break
 
     video_capture.release()
     cv2.destroyAllWindows()
+    evidence_writer.close()
+
+def iter_frames(source, fps):
+    """
+    Yields (frame, seconds since start) from a video file, a camera index or a
+    folder of images. Video files use their own timestamps.
+    """
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')))
+        for index, filename in enumerate(names):
+            frame = cv2.imread(os.path.join(source, filename))
+            if frame is not None:
+                yield frame, index / fps
+        return
+
+    capture = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    index = 0
+    try:
+        while True:
+            with tracing.span("capture"):
+                ret, frame = capture.read()
+            if not ret: break
+            msec = capture.get(cv2.CAP_PROP_POS_MSEC)
+            yield frame, (msec / 1000.0) if msec > 0 else index / fps
+            index += 1
+    finally:
+        capture.release()
+
+def run_headless(source, events_path, write_db, start_time, fps, stride, detector_mode=DETECTOR):
+    """
+    No GUI: processes frames as fast as the CPU allows and writes events as JSON lines.
+    Only events go to stdout; every other message (banner, DB logs, summary) goes to stderr.
+    """
+    out = open(events_path, 'w', encoding='utf-8') if events_path else sys.stdout
+    try:
+        # print() calls below and inside db_manager/gallery land on stderr, out keeps the real stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            _process_headless(source, out, write_db, start_time, fps, stride, detector_mode)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+def _process_headless(source, out, write_db, start_time, fps, stride, detector_mode):
+    print(f"--- 🚀 Headless batch mode: {source} ---")
+
+    gallery = Gallery()
+    detector = FaceDetector(detector_mode)
+    hints = []
+    liveness = LivenessTracker(threshold=EYE_ASPECT_RATIO_THRESHOLD, consecutive_frames=CONSECUTIVE_FRAMES)
+    # Cooldown on the footage clock, so replays behave like the live system
+    last_event = {}
+
+    frames = analyzed = faces = events = 0
+    started = time.perf_counter()
+    for frame, offset in iter_frames(source, fps):
+        frames += 1
+        if (frames - 1) % stride:
+            continue
+        analyzed += 1
+        now = start_time.timestamp() + offset
+
+        result = analyze_frame(frame, gallery, liveness, now=now, detector=detector, hints=hints)
+        hints = [result["face_loc"]] if result else []
+        if result is None:
+            continue
+        faces += 1
+        if not result["blinked"]:
+            continue
+
+        user_id = result["user_id"]
+        if user_id in last_event and now - last_event[user_id] < db_manager.ATTENDANCE_COOLDOWN_SECONDS:
+            continue
+        last_event[user_id] = now
+
+        when = datetime.fromtimestamp(now)
+        attendance_id = db_manager.mark_attendance(user_id, when=when) if write_db else None
+        events += 1
+        out.write(json.dumps({
+            "time": when.strftime("%Y-%m-%d %H:%M:%S"),
+            "offset": round(offset, 3),
+            "frame": frames - 1,
+            "user_id": user_id,
+            "name": result["name"],
+            "distance": round(result["distance"], 4),
+            "attendance_id": attendance_id,
+        }, ensure_ascii=False) + "\n")
+
+    elapsed = time.perf_counter() - started
+    print(f"\n📊 {frames} frames read, {analyzed} analyzed, {faces} with a face, {events} attendance events")
+    print(f"⏱️ {elapsed:.1f}s wall time, {analyzed / max(elapsed, 1e-9):.1f} analyzed fps, "
+          f"{frames / max(elapsed, 1e-9):.1f} read fps")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Blink-verified attendance (camera window, or headless batch mode).")
+    parser.add_argument('--headless', metavar='SOURCE', help="video file, camera index or folder of images to process without a GUI")
+    parser.add_argument('--events', metavar='FILE', help="JSON lines output (default: stdout)")
+    parser.add_argument('--write-db', action='store_true', help="also record attendance in the database")
+    parser.add_argument('--start', help="wall-clock time of the first frame, 'YYYY-MM-DD HH:MM:SS' (default: now)")
+    parser.add_argument('--fps', type=float, default=30.0, help="frame rate for image folders / files without timestamps")
+    parser.add_argument('--stride', type=int, default=1, help="analyze every Nth frame")
+    parser.add_argument('--detector', choices=DETECTORS, default=DETECTOR, help=f"face detection stage (default {DETECTOR})")
+    parser.add_argument('--trace', metavar='FILE', help="record a per-frame timeline and write it here on exit (Chrome trace JSON)")
+    args = parser.parse_args()
+
+    if args.trace:
+        tracing.enable()
+        tracing.install_signal_handler()
+    try:
+        if args.headless:
+            start_time = datetime.strptime(args.start, "%Y-%m-%d %H:%M:%S") if args.start else datetime.now()
+            run_headless(args.headless, args.events, args.write_db, start_time, args.fps, max(1, args.stride), args.detector)
+        else:
+            main(args.detector)
+    finally:
+        if args.trace:
+            print(f"🧵 Trace written to {tracing.dump(args.trace)}", file=sys.stderr)
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from modules import db_manager
+from modules.face_encoder import encode_single_face
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+BATCH_EMPLOYEES = 100       # عدد الموظفين في كل معاملة (transaction)
+MAX_IMAGES_PER_EMPLOYEE = 20
+STATE_FILENAME = '.bulk_import_state.json'
+
+def find_employees(root):
+    """One subfolder per employee: {folder_name: [image paths]}"""
+    employees = {}
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if not entry.is_dir():
+            continue
+        images = []
+        for dirpath, _, filenames in os.walk(entry.path):
+            for filename in sorted(filenames):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    images.append(os.path.join(dirpath, filename))
+        if images:
+            employees[entry.name] = images[:MAX_IMAGES_PER_EMPLOYEE]
+    return employees
+
+def load_state(state_path):
+    if os.path.exists(state_path):
+        with open(state_path, encoding='utf-8') as f:
+            return json.load(f)
+    return {"done": {}}
+
+def save_state(state_path, state):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, state_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk enrollment from a folder of employee photos (one subfolder per employee).")
+    parser.add_argument('folder')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch', type=int, default=BATCH_EMPLOYEES, help="employees per DB transaction")
+    parser.add_argument('--restart', action='store_true', help="ignore the resume state and import everything again")
+    args = parser.parse_args()
+
+    print("\n--- 👥 Bulk Employee Import ---")
+    db_manager.init_db()
+
+    state_path = os.path.join(args.folder, STATE_FILENAME)
+    state = {"done": {}} if args.restart else load_state(state_path)
+    inserting = state.pop("inserting", None)
+    if inserting:
+        # The previous run stopped between the insert and saving the state: adopt what it committed
+        found = db_manager.get_user_ids_by_name(inserting["names"], inserting["after_id"])
+        state["done"].update(found)
+        save_state(state_path, state)
+        print(f"♻️ Recovered {len(found)} employees inserted by the interrupted run.")
+
+    employees = find_employees(args.folder)
+    pending = [name for name in employees if name not in state["done"]]
+    print(f"📂 {len(employees)} employees found, {len(employees) - len(pending)} already imported, {len(pending)} to go.")
+
+    skipped = {"no_face": 0, "multiple_faces": 0, "error": 0}
+    imported = 0
+    images_done = 0
+    start = time.time()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for batch_start in range(0, len(pending), args.batch):
+            batch = pending[batch_start:batch_start + args.batch]
+            paths = [path for name in batch for path in employees[name]]
+            owner = {path: name for name in batch for path in employees[name]}
+
+            encodings = {name: [] for name in batch}
+            had_errors = set()
+            for path, encoding, status in pool.map(encode_single_face, paths, chunksize=4):
+                if status == 'ok':
+                    encodings[owner[path]].append(encoding)
+                else:
+                    if status not in ('no_face', 'multiple_faces'):
+                        had_errors.add(owner[path])
+                    skipped[status if status in skipped else 'error'] += 1
+                    print(f"⚠️ Skipped {path}: {status}")
+
+            to_insert = [(name, encodings[name]) for name in batch if encodings[name]]
+            if to_insert:
+                # Saved before the insert, so a crash before the state below is written cannot duplicate employees
+                state["inserting"] = {"names": [name for name, _ in to_insert], "after_id": db_manager.get_last_user_id()}
+                save_state(state_path, state)
+            user_ids = db_manager.add_users_bulk(to_insert) if to_insert else []
+            if to_insert and not user_ids:
+                state.pop("inserting")
+                save_state(state_path, state)
+                print("❌ Database insert failed, stopping. Run again to resume.")
+                break
+
+            # Only mark the batch done after its transaction committed
+            state.pop("inserting", None)
+            for (name, _), user_id in zip(to_insert, user_ids):
+                state["done"][name] = user_id
+            for name in batch:
+                # No usable photo: final only if every photo was really checked (errors are retried on resume)
+                if not encodings[name] and name not in had_errors:
+                    state["done"][name] = None
+            save_state(state_path, state)
+
+            imported += len(user_ids)
+            images_done += len(paths)
+            elapsed = time.time() - start
+            print(f"💾 {batch_start + len(batch)}/{len(pending)} employees processed "
+                  f"({images_done / max(elapsed, 1e-6):.1f} images/s)")
+
+    print(f"\n🎉 Imported {imported} employees in {time.time() - start:.1f}s. "
+          f"Skipped images: {skipped['no_face']} no face, {skipped['multiple_faces']} multiple faces, {skipped['error']} errors.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import os
+import argparse
+from modules import db_manager
+
+def main():
+    parser = argparse.ArgumentParser(description="Collapses old attendance rows into per-day presence intervals.")
+    parser.add_argument('--days', type=int, default=db_manager.COMPACT_AFTER_DAYS,
+                        help="compact rows older than this many days (today is never compacted)")
+    parser.add_argument('--gap', type=int, default=db_manager.INTERVAL_GAP_MINUTES,
+                        help="minutes between two marks that start a new interval")
+    parser.add_argument('--vacuum', action='store_true', help="shrink the database file afterwards")
+    args = parser.parse_args()
+
+    print("--- 🗜️ Attendance Compaction ---")
+    db_manager.init_db()
+    size_before = os.path.getsize(db_manager.DB_PATH)
+    result = db_manager.compact_attendance(args.days, args.gap)
+    if result is None:
+        print("❌ Compaction failed, nothing was changed.")
+        return
+    if not result["events"]:
+        print(f"✅ Nothing to compact before {result['before']}.")
+        return
+    print(f"✅ {result['events']} rows before {result['before']} → {result['intervals']} intervals")
+
+    if args.vacuum:
+        conn = db_manager.get_db_connection()
+        conn.execute('VACUUM')
+        conn.close()
+        print(f"💾 Database: {size_before / 1024:.0f} KB → {os.path.getsize(db_manager.DB_PATH) / 1024:.0f} KB")
+
+if __name__ == "__main__":
+    main()
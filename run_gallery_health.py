@@ -0,0 +1,53 @@
+import json
+import time
+import argparse
+import numpy as np
+from modules import db_manager
+from modules import gallery_health
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks the faces table for colliding employees, duplicate enrollments and outlier samples.")
+    parser.add_argument('--json', metavar='FILE', help="also write the full report as JSON")
+    parser.add_argument('--block', type=int, default=gallery_health.BLOCK_SIZE, help="rows per distance block (memory bound)")
+    args = parser.parse_args()
+
+    print("--- 🩺 Gallery Health Check ---")
+    faces = db_manager.get_all_faces()
+    if len(faces) < 2:
+        print("❌ Not enough samples to analyze.")
+        return
+
+    start = time.time()
+    report = gallery_health.analyze(
+        [face["face_id"] for face in faces],
+        [face["id"] for face in faces],
+        [face["name"] for face in faces],
+        np.array([face["encoding"] for face in faces]),
+        block_size=args.block,
+    )
+    print(f"📊 {report['samples']} samples from {len(report['users'])} employees analyzed in {time.time() - start:.1f}s")
+
+    widest = sorted(report["users"], key=lambda u: u["spread_max"], reverse=True)[:5]
+    print("\nWidest intra-employee spread (mean / max distance to own centroid):")
+    for user in widest:
+        print(f"  #{user['user_id']} {user['name']}: {user['spread_mean']:.3f} / {user['spread_max']:.3f} ({user['samples']} samples)")
+
+    print(f"\n⚠️ {len(report['suspicious_pairs'])} employee pairs closer than {gallery_health.COLLISION_DISTANCE}:")
+    for pair in report["suspicious_pairs"]:
+        tag = " ← likely the same person enrolled twice" if pair["likely_duplicate"] else ""
+        print(f"  #{pair['user_a']} {pair['name_a']} ↔ #{pair['user_b']} {pair['name_b']}: "
+              f"min {pair['min_distance']:.3f}, centroids {pair['centroid_distance']:.3f}{tag}")
+
+    print(f"\n⚠️ {len(report['outliers'])} outlier samples:")
+    for sample in report["outliers"]:
+        print(f"  face {sample['face_id']} of #{sample['user_id']} {sample['name']}: "
+              f"{sample['distance_to_own_centroid']:.3f} from own centroid, "
+              f"nearest other employee #{sample['nearest_other_user']} at {sample['nearest_other_distance']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Report saved to {args.json}")
+
+if __name__ == "__main__":
+    main()
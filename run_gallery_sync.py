@@ -0,0 +1,64 @@
+import os
+import argparse
+from modules import db_manager
+from modules import gallery_sync
+
+def cmd_export(args):
+    since = args.since
+    header = gallery_sync.export_bundle(args.path, since_version=since)
+    kind = "full" if since is None else f"delta since v{since}"
+    faces = sum(u["faces"] for u in header["users"])
+    print(f"📦 Exported {kind}: {len(header['users'])} employees, {faces} faces, "
+          f"{len(header['tombstones'])} deletions (gallery v{header['gallery_version']})")
+    print(f"💾 {args.path} ({os.path.getsize(args.path) / 1024:.1f} KB)")
+
+def cmd_import(args):
+    result = gallery_sync.import_bundle(args.path, only_new=not args.all)
+    if result is None:
+        print("❌ Import failed, local database unchanged.")
+        return
+    print(f"✅ Imported from node {result['source'][:8]} v{result['source_version']} "
+          f"(previously v{result['previous_version']}): "
+          f"{result['added']} added, {result['updated']} updated, {result['deleted']} deleted, "
+          f"{result['unchanged'] + result['skipped']} already up to date")
+
+def cmd_info(args):
+    header, users = gallery_sync.read_bundle(args.path)
+    kind = "full" if header["since_version"] is None else f"delta since v{header['since_version']}"
+    print(f"📦 Bundle from node {header['node_id']} (gallery v{header['gallery_version']}, {kind}) ✅ checksum OK")
+    for user in users:
+        print(f"  {user['uid'][:8]} {user['name']}: {user['faces']} faces (v{user['version']})")
+    for tomb in header["tombstones"]:
+        print(f"  {tomb['uid'][:8]} deleted (v{tomb['version']})")
+    last = db_manager.get_sync_value(f"last_import:{header['node_id']}")
+    if last is not None:
+        print(f"Last imported from this node: v{last}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Exports/imports the enrolled staff gallery between attendance nodes.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export = sub.add_parser('export', help="write the local gallery to a bundle file")
+    export.add_argument('path')
+    export.add_argument('--since', type=int, help="only employees changed/deleted after this gallery version")
+    export.set_defaults(func=cmd_export)
+
+    imp = sub.add_parser('import', help="merge a bundle into the local database")
+    imp.add_argument('path')
+    imp.add_argument('--all', action='store_true', help="apply every employee in the bundle, not just the ones changed since the last import")
+    imp.set_defaults(func=cmd_import)
+
+    info = sub.add_parser('info', help="show the contents of a bundle")
+    info.add_argument('path')
+    info.set_defaults(func=cmd_info)
+
+    args = parser.parse_args()
+    db_manager.init_db()
+    print("--- 🔄 Gallery Sync ---")
+    try:
+        args.func(args)
+    except (gallery_sync.BundleError, OSError) as e:
+        print(f"❌ {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+from modules.camera import VideoCamera
+from modules.frame_bus import FramePublisher, WORKER_ADDRESS
+from modules import tracing
+
+def main():
+    print("--- 🎥 Recognition Worker (camera + face recognition) ---")
+
+    camera = VideoCamera()
+    publisher = FramePublisher(on_subscribe=camera.encoder.add_subscriber,
+                               on_unsubscribe=camera.encoder.remove_subscriber)
+    camera.on_event = publisher.publish_event
+
+    print(f"🟢 Publishing frames and events on {WORKER_ADDRESS[0]}:{WORKER_ADDRESS[1]} (Ctrl+C to stop)")
+    if tracing.enabled and tracing.install_signal_handler():
+        print(f"🧵 Tracing on: send SIGUSR1 (Ctrl+Break on Windows) to write a trace to {tracing.TRACE_DIR}")
+
+    try:
+        while True:
+            # Recognition runs on every frame; JPEG is only produced while the web app is watching
+            frame = camera.get_frame()
+            if frame:
+                with tracing.span("publish"):
+                    publisher.publish_frame(frame)
+    except KeyboardInterrupt:
+        print("Stopping worker...")
+    finally:
+        publisher.close()
+
+if __name__ == "__main__":
+    main()